@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""OpenAI APIクライアントの作成と、応答が遅いリクエストのヘッジ
+
+クライアントは接続プールとタイムアウトを明示して作成し、応答が止まったリクエストが
+いつまでも処理を塞がないようにする。ヘッジを有効にすると、直近の応答時間の
+パーセンタイルを過ぎても応答（ストリーミングでは最初のトークン）が無いリクエストを
+もう1つ送り、先に応答した方を使う。
+"""
+import os
+import time
+import queue
+import contextlib
+import logging
+import threading
+from collections import deque
+
+import openai
+
+try:
+    import httpx
+except ImportError:  # openaiの依存ライブラリのため通常はインストール済み
+    httpx = None
+
+
+def create_client(config):
+    """接続プールとタイムアウトを設定したクライアントを作成（再試行は rate_limiter 側で行う）"""
+    timeout = openai.Timeout(config.get("request_timeout", 300), connect=config.get("connect_timeout", 10))
+    http_client = None
+    if httpx is not None:
+        pool_size = config.get("connection_pool_size", 20)
+        http_client = openai.DefaultHttpxClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+    return openai.OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=timeout,
+        max_retries=0,
+        http_client=http_client
+    )
+
+
+class LatencyTracker:
+    """直近の応答時間を記録し、パーセンタイルを返す"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=20):
+        """p パーセンタイル（サンプルが min_samples 未満ならNone）"""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def hedged_call(func, hedge_after=None, tracker=None, on_discard=None):
+    """func を呼び出し、送信後 hedge_after 秒たっても終わらなければもう1つ呼び出して先に成功した方の結果を返す
+
+    func は引数 sending を受け取り、実際に送信する部分を `with sending():` で囲む。
+    所要時間とヘッジまでの待ち時間はその送信から数え、レート制限や再試行の待ちは含めない
+    （送信が失敗して再試行を待つ間はヘッジしない）。
+    両方失敗した場合は最後の例外を送出する。使われなかった方の結果は on_discard に渡す
+    （ストリームを閉じる・トークン数を記録するなど）。各呼び出しの所要時間は tracker に記録する。
+    """
+    results = queue.Queue()  # ("sent" / "failed" / "done", 名前, 結果, 例外)
+
+    def run(name):
+        sent_at = []
+
+        @contextlib.contextmanager
+        def sending():
+            sent_at.append(time.monotonic())
+            results.put(("sent", name, None, None))
+            try:
+                yield
+            except BaseException:
+                results.put(("failed", name, None, None))
+                raise
+
+        try:
+            value = func(sending)
+        except Exception as e:
+            results.put(("done", name, None, e))
+            return
+        if tracker is not None and sent_at:
+            tracker.add(time.monotonic() - sent_at[-1])
+        results.put(("done", name, value, None))
+
+    def next_result():
+        while True:
+            kind, name, value, error = results.get()
+            if kind == "done":
+                return name, value, error
+
+    if not hedge_after:
+        run("primary")
+        _, value, error = next_result()
+        if error is not None:
+            raise error
+        return value
+
+    threading.Thread(target=run, args=("primary",), name="request-primary", daemon=True).start()
+    launched = 1
+    deadline = None  # 最初のリクエストを送信してからヘッジするまでの期限
+    while True:
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            kind, name, value, error = results.get(timeout=timeout)
+        except queue.Empty:
+            logging.info(f"送信から{hedge_after:.1f}秒たっても応答が無いため、同じリクエストをもう1つ送信します")
+            threading.Thread(target=run, args=("hedge",), name="request-hedge", daemon=True).start()
+            launched = 2
+            name, value, error = next_result()
+            break
+        if kind == "sent":
+            deadline = time.monotonic() + hedge_after
+        elif kind == "failed":
+            deadline = None
+        else:
+            break
+    remaining = launched - 1
+    while error is not None and remaining:
+        name, value, error = next_result()
+        remaining -= 1
+    if error is not None:
+        raise error
+    if launched == 2:
+        logging.info("追加送信したリクエストが先に応答しました" if name == "hedge" else "最初のリクエストが先に応答しました")
+    if remaining and on_discard is not None:
+        def discard():
+            _, loser, loser_error = next_result()
+            if loser_error is None:
+                try:
+                    on_discard(loser)
+                except Exception as e:
+                    logging.warning(f"使われなかった応答の破棄に失敗: {e}")
+        threading.Thread(target=discard, name="request-discard", daemon=True).start()
+    return value
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""書き込み途中のファイルが残らないよう、一時ファイル経由で置き換えるヘルパー"""
+import os
+
+
+class AtomicFile:
+    """一時ファイル（<path>.part）に書き込み、正常終了時に目的のパスへ置き換える
+
+    with ブロック内で例外が発生した場合や discard() を呼んだ場合は一時ファイルを削除し、
+    既存のファイルには手を付けない。
+    """
+
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path
+        self.temp_path = f"{path}.part"
+        self.encoding = encoding
+        self._file = None
+        self._discarded = False
+
+    def __enter__(self):
+        self._file = open(self.temp_path, "w", encoding=self.encoding)
+        return self
+
+    def write(self, text):
+        self._file.write(text)
+
+    def flush(self):
+        """書き込んだ内容を他のプロセスから見えるようにする"""
+        self._file.flush()
+
+    def discard(self):
+        self._discarded = True
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        commit = exc_type is None and not self._discarded
+        try:
+            if commit:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+        if commit:
+            os.replace(self.temp_path, self.path)
+        else:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+        return False
+
+
+def write_atomic(path, text, encoding="utf-8"):
+    """テキストを一時ファイル経由で書き込む"""
+    with AtomicFile(path, encoding) as f:
+        f.write(text)
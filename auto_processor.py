@@ -1,32 +1,49 @@
 #!/usr/bin/env python3
 import os
+import glob
 import json
 import time
-import glob
 import shutil
+import itertools
+from types import SimpleNamespace
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import openai
 import logging
+import logging.handlers
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from api_client import LatencyTracker, create_client, hedged_call
+from atomic_file import AtomicFile, write_atomic
+from file_lease import LeaseManager
+from file_scheduler import FileScheduler, pending_files
+from folder_watcher import FolderWatcher
+from job_ledger import JobLedger
+from live_transcript import LiveTranscripts
+from metrics import MetricsRecorder, estimate_cost
+from model_router import InputTooLongError, plan_request
+from near_duplicate import NearDuplicateIndex, signature
+from rate_limiter import RateLimiter, call_with_retry
+from search_index import SearchIndex
+from stage_labels import STAGE_LABELS
+from result_cache import ResultCache
+from transcript_chunker import count_tokens, estimate_tokens, split_transcript
+from transcript_cleaner import DEFAULT_FILLERS, clean_transcript
+from transcript_loader import load_transcript
 
 # .envファイルから環境変数を読み込む
 load_dotenv()
 
-# APIキーを環境変数から取得
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# APIキーは環境変数 OPENAI_API_KEY から api_client.create_client で読み込む（再試行はrate_limiter側でまとめて制御する）
 
-# ロギング設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('auto_processor.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# status.txt / status.json の出力先（ベンチマークなどで差し替えられるようにしておく）
+STATUS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+# 状態ファイルを書き出すか（main() で有効にする。batch_processor などから import した場合は
+# 動作中の auto_processor の状態を上書きしないよう書き出さない）
+publish_status = False
 
-# 状態管理
+# 状態管理（複数ワーカーから更新されるためstatus_lockで保護する）
+status_lock = threading.RLock()
 status_data = {
     "is_running": False,
     "last_check": None,
@@ -34,14 +51,179 @@ status_data = {
     "processed_count": 0,
     "error_count": 0,
     "last_error": None,
-    "current_processing": None,  # 現在処理中のファイル名
-    "last_processed": None       # 最後に処理したファイル名
+    "in_progress": {},           # 処理中のファイル名 → ジョブ情報（開始時刻・サイズ・段階・トークン数）
+    "last_processed": None,      # 最後に処理したファイル名
+    "cache_hits": 0,             # キャッシュから議事録を再利用した回数
+    "cache_misses": 0            # キャッシュに無く生成した回数
 }
 
+# 生成済み議事録のキャッシュ（フォルダごとに1つ）
+result_caches = {}
+
+# 全ワーカーで共有するAPI呼び出しのレート制御
+rate_limiter = RateLimiter()
+
+# ファイルごとの処理状況を永続化するジョブ台帳（パスごとに1つ）
+job_ledgers = {}
+
+# 監視フォルダを他のワーカーと共有するためのリース（監視フォルダごとに1つ）
+lease_managers = {}
+
+# 処理時間・トークン数の記録（出力先ごとに1つ）
+metrics_recorders = {}
+
+# 接続プールを持つAPIクライアント（タイムアウト等の設定ごとに1つ）
+api_clients = {}
+
+# ヘッジの判断に使う直近の応答時間（モデル・ストリーミングの有無ごとに1つ）
+latency_trackers = {}
+
+# 処理待ちファイルの処理順（監視フォルダごとに1つ）
+file_schedulers = {}
+
+# 議事録と処理済みの文字起こしの全文検索インデックス（フォルダごとに1つ）
+search_indexes = {}
+
+# 処理済みの文字起こしの署名（ほぼ同じ内容の検出用、パスごとに1つ）
+duplicate_indexes = {}
+
+# 会議中に追記されている文字起こしの読み込み位置と要約済みのメモ（状態フォルダごとに1つ）
+live_transcripts = {}
+
+def update_status(**changes):
+    """状態を更新して状態ファイルに反映（スレッドセーフ）"""
+    with status_lock:
+        status_data.update(changes)
+        update_status_file()
+
+def record_error(message, count=True):
+    """エラーを状態に記録（スレッドセーフ）"""
+    with status_lock:
+        if count:
+            status_data['error_count'] += 1
+        status_data['last_error'] = message
+        update_status_file()
+
+def begin_job(file_name, size=None):
+    """処理中ファイルとして登録"""
+    with status_lock:
+        status_data['in_progress'][file_name] = {
+            "started_at": datetime.now(),
+            "bytes": size,
+            "stage": "reading",
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "ttft_seconds": None,
+            "preprocess_saved_tokens": 0,  # 前処理で削減した入力トークン数
+            "duplicate_of": None,        # ほぼ同じ内容の処理済みファイル名
+            "duplicate_similarity": None,
+            "usage_by_model": {},        # モデル名 → トークン数
+            "stage_seconds": {},         # 段階 → 所要時間（秒）
+            "stage_started": time.monotonic()
+        }
+        update_status_file()
+
+def _close_stage(job):
+    """現在の段階の所要時間を記録"""
+    now = time.monotonic()
+    stage_seconds = job["stage_seconds"]
+    stage_seconds[job["stage"]] = stage_seconds.get(job["stage"], 0) + now - job["stage_started"]
+    job["stage_started"] = now
+
+def update_job(file_name, **fields):
+    """処理中ファイルの情報（段階など）を更新"""
+    if file_name is None:
+        return
+    with status_lock:
+        job = status_data['in_progress'].get(file_name)
+        if job is None:
+            return
+        if fields.get("stage", job["stage"]) != job["stage"]:
+            _close_stage(job)
+        job.update(fields)
+        update_status_file()
+
+def add_job_usage(file_name, usage, model=None):
+    """API応答のトークン使用量を処理中ファイルに加算"""
+    if file_name is None or usage is None:
+        return
+    with status_lock:
+        job = status_data['in_progress'].get(file_name)
+        if job is None:
+            return
+        job["prompt_tokens"] += usage.prompt_tokens or 0
+        job["completion_tokens"] += usage.completion_tokens or 0
+        if model:
+            totals = job["usage_by_model"].setdefault(model, {"prompt_tokens": 0, "completion_tokens": 0})
+            totals["prompt_tokens"] += usage.prompt_tokens or 0
+            totals["completion_tokens"] += usage.completion_tokens or 0
+        update_status_file()
+
+def end_job(file_name):
+    """処理中ファイルから除外し、ジョブ情報を返す"""
+    with status_lock:
+        job = status_data['in_progress'].pop(file_name, None)
+        if job is not None:
+            _close_stage(job)
+        update_status_file()
+        return job
+
 def update_status_file():
-    """ユーザー向けの状態ファイルを更新"""
+    """ユーザー向けの状態ファイル（status.txt）と機械読み取り用の status.json を更新"""
+    if not publish_status:
+        return
+    # 複数ワーカーからの同時書き込みを防ぐためロック内で生成・書き込みを行う
+    with status_lock:
+        _write_status_file()
+        _write_status_json()
+
+def _format_iso(value):
+    return value.isoformat(timespec="seconds") if value else None
+
+def status_snapshot():
+    """現在の状態をJSONに変換できる辞書で返す"""
+    with status_lock:
+        jobs = []
+        for file_name, job in sorted(status_data['in_progress'].items()):
+            jobs.append({
+                "file": file_name,
+                "started_at": _format_iso(job["started_at"]),
+                "elapsed_seconds": round((datetime.now() - job["started_at"]).total_seconds(), 1),
+                "bytes": job["bytes"],
+                "stage": job["stage"],
+                "prompt_tokens": job["prompt_tokens"],
+                "completion_tokens": job["completion_tokens"],
+                "ttft_seconds": job["ttft_seconds"]
+            })
+        return {
+            "is_running": status_data['is_running'],
+            "last_check": _format_iso(status_data['last_check']),
+            "next_check": _format_iso(status_data['next_check']),
+            "processed_count": status_data['processed_count'],
+            "error_count": status_data['error_count'],
+            "last_error": status_data['last_error'],
+            "last_processed": status_data['last_processed'],
+            "cache": {"hits": status_data['cache_hits'], "misses": status_data['cache_misses']},
+            "jobs": jobs,
+            "updated_at": _format_iso(datetime.now())
+        }
+
+def _write_status_json():
+    """status.json を一時ファイル経由で置き換え（読み手が書きかけを読むことはない）"""
+    try:
+        status_path = os.path.join(STATUS_FOLDER, "status.json")
+        write_atomic(status_path, json.dumps(status_snapshot(), ensure_ascii=False, indent=2))
+    except Exception as e:
+        logging.error(f"状態ファイル更新エラー: {e}")
+
+def _write_status_file():
+    """状態ファイルを書き込み（status_lockを保持した状態で呼び出す）"""
     try:
-        current_processing = f"現在処理中: {status_data['current_processing']}" if status_data['current_processing'] else "現在処理中: なし"
+        in_progress = [
+            f"{file_name}（{STAGE_LABELS.get(job['stage'], job['stage'])}）"
+            for file_name, job in sorted(status_data['in_progress'].items())
+        ]
+        current_processing = f"現在処理中: {', '.join(in_progress)}" if in_progress else "現在処理中: なし"
         last_processed = f"最後に処理したファイル: {status_data['last_processed']}" if status_data['last_processed'] else "まだファイルは処理されていません"
         
         status_text = f"""議事録自動生成システム 状態確認
@@ -50,20 +232,47 @@ def update_status_file():
 最終チェック: {status_data['last_check'].strftime('%Y年%m月%d日 %H時%M分') if status_data['last_check'] else 'まだ実行されていません'}
 次回チェック: {status_data['next_check'].strftime('%Y年%m月%d日 %H時%M分') if status_data['next_check'] else '---'}
 処理済みファイル数: {status_data['processed_count']}個
+同時処理数: {len(in_progress)}件
 {current_processing}
 {last_processed}
+キャッシュ: ヒット{status_data['cache_hits']}件 / ミス{status_data['cache_misses']}件
 エラー数: {status_data['error_count']}個
 最終エラー: {status_data['last_error'] or 'なし'}
 
 更新時刻: {datetime.now().strftime('%Y年%m月%d日 %H時%M分%S秒')}
 """
         # パス参照を修正
-        status_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "status.txt")
-        with open(status_path, "w", encoding="utf-8") as f:
-            f.write(status_text)
+        status_path = os.path.join(STATUS_FOLDER, "status.txt")
+        write_atomic(status_path, status_text)
     except Exception as e:
         logging.error(f"状態ファイル更新エラー: {e}")
 
+def setup_logging(config, log_file='auto_processor.log'):
+    """ロギング設定（ログファイルはサイズまたは時刻でローテーションする）
+
+    ローテーションは1つのプロセスからしか行えないため、プロセスごとに別のファイルを指定する。
+    """
+    backup_count = config.get("log_backup_count", 5)
+    rotate_when = config.get("log_rotate_when")
+    if rotate_when:
+        # 例: "midnight" で毎日0時に切り替え
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8'
+        )
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=int(config.get("log_max_mb", 5) * 1024 * 1024),
+            backupCount=backup_count, encoding='utf-8'
+        )
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            file_handler,
+            logging.StreamHandler()
+        ]
+    )
+
 def load_config():
     """設定ファイルを読み込み"""
     config_file = "auto_config.json"
@@ -72,10 +281,76 @@ def load_config():
         "output_folder": "output",
         "processed_folder": "archive",
         "check_interval": 30,  # 30分
+        "max_concurrency": 3,  # 同時に処理するファイル数
+        "watch_mode": "event",  # event: 変更を検知して即時処理 / poll: check_intervalごとに処理
+        "settle_seconds": 5,  # サイズと更新時刻がこの秒数変化しなければ書き込み完了とみなす
+        "watch_poll_interval": 2,  # inotifyが使えない環境でのスキャン間隔（秒）
         "system_prompt": "会議の文字起こしから議事録を作成してください。以下の形式で：\n\n# 議事録\n## 日時・参加者\n## 議題\n## 決定事項\n## アクションアイテム\n- 誰が、何を、いつまでに\n## 次回予定",
         "model": "gpt-4-turbo",
         "max_tokens": 4096,
-        "temperature": 0.3
+        "temperature": 0.3,
+        "stream": True,  # 生成中の議事録を output/ の一時ファイルに逐次書き込む
+        "cache_enabled": True,  # 同じ文字起こし・設定の議事録はキャッシュから再利用する
+        "cache_folder": "cache",
+        "cache_max_mb": 200,  # キャッシュの容量上限（MB）
+        "cache_max_age_days": 90,  # これより古いキャッシュは削除
+        "chunk_threshold_tokens": 60000,  # これを超える文字起こしは分割して要約
+        "chunk_tokens": 12000,  # 分割時の1チャンクあたりのトークン数
+        "chunk_overlap_tokens": 300,  # チャンク間で重複させるトークン数
+        "chunk_parallelism": 4,  # チャンクを同時に要約する数
+        "rate_limits": {},  # モデルごとの1分あたりのリクエスト数・トークン数の上限（空なら制限せず429を受けたら待つ）
+        "max_retries": 6,  # レート制限・一時的なエラー時の再試行回数
+        "retry_base_delay": 2,  # 再試行の初回待機秒数（以降は倍々に増える）
+        "retry_max_delay": 60,  # 再試行の最大待機秒数
+        "batch_folder": "batch",  # batch_processor.py の作業フォルダ
+        "batch_poll_interval": 60,  # バッチの完了確認間隔（秒）
+        "log_max_mb": 5,  # ログファイルがこのサイズ（MB）を超えたら切り替える
+        "log_backup_count": 5,  # 残す古いログファイルの数
+        "log_rotate_when": "",  # "midnight" などを指定するとサイズではなく時刻で切り替える
+        "ledger_path": "jobs.db",  # ジョブ台帳（SQLite）のパス。空にすると台帳を使わない
+        "lease_enabled": True,  # ファイルを確保してから処理する（複数台・複数プロセスで監視フォルダを共有する場合に必要）
+        "processing_folder": "",  # 確保したファイルの置き場所（空なら監視フォルダ内の processing）
+        "lease_ttl": 300,  # この秒数リースが更新されないワーカーは停止したとみなす
+        "worker_id": "",  # ワーカーの識別名（空ならホスト名。動作中の別のプロセスと重なる場合は末尾にプロセスIDを付ける）
+        "metrics_path": "metrics.jsonl",  # ファイルごとの処理時間・トークン数・推定コストを追記するJSONL（空なら記録しない）
+        "prometheus_path": "metrics.prom",  # 累計をPrometheusのテキスト形式で書き出すファイル（空なら書き出さない）
+        "metrics_port": 0,  # 0以外を指定すると http://metrics_host:ポート/metrics で累計を公開する
+        "metrics_host": "127.0.0.1",
+        "model_prices": {},  # 推定コストに使う価格の上書き（例: {"gpt-4o": {"input": 0.0025, "output": 0.01}}、USD/1Kトークン）
+        "model_routes": [],  # 入力トークン数によるモデルの切り替え（例: [{"max_input_tokens": 8000, "model": "gpt-4o"}]）
+        "context_windows": {},  # モデルごとのコンテキスト長の上書き（例: {"gpt-4o": 128000}）
+        "min_output_tokens": 1024,  # 出力にこれだけのトークン数を確保できない入力は分割するか、処理しない
+        "output_formats": [],  # 複数形式で出力する場合のテンプレート名（例: ["標準", "要約重視"]）。空なら system_prompt の1形式
+        "prompt_folder": "プロンプト例",  # output_formats のテンプレートを置くフォルダ
+        "condense_prompt": "",  # 複数形式の元になる構造化メモの作成プロンプト（空なら既定のもの）
+        "preprocess_enabled": True,  # APIに送る前に文字起こしを整形して入力トークンを減らす
+        "preprocess_timestamps": "strip",  # strip: 削除 / compress: 分単位で変化した時だけ残す / keep: 残す
+        "preprocess_fillers": DEFAULT_FILLERS,  # 削除するフィラー（空にすると削除しない）
+        "preprocess_merge_speakers": True,  # 同じ話者の連続した発言を1行にまとめる
+        "preprocess_dedupe": True,  # 音声認識で繰り返された言葉・発言を取り除く
+        "request_timeout": 300,  # APIの応答（ストリーミングでは次のデータ）を待つ最大秒数。超えたら再試行する
+        "connect_timeout": 10,  # API への接続を待つ最大秒数
+        "connection_pool_size": 20,  # APIへの同時接続数の上限（接続は再利用する）
+        "hedge_enabled": False,  # 応答が遅いリクエストを追加で送信し、先に応答した方を使う
+        "hedge_percentile": 95,  # 直近の応答時間（ストリーミングでは最初のトークンまで）のこのパーセンタイルを過ぎたら追加送信
+        "hedge_min_samples": 20,  # 応答時間がこの件数たまるまではヘッジしない
+        "hedge_min_delay": 1,  # 追加送信までの最短の待ち秒数
+        "live_enabled": False,  # 会議中に追記されていくファイルを区間ごとに要約しておき、書き込み完了後は統合だけ行う（watch_mode: event のみ）
+        "live_folder": "live",  # ライブ処理の読み込み位置・要約済みメモの保存先
+        "live_start_seconds": 60,  # この秒数以上追記され続けているファイルをライブ処理の対象にする
+        "live_settle_seconds": 120,  # 追記されているファイルは、この秒数追記が無ければ会議が終わったとみなす
+        "live_segment_tokens": 3000,  # 追記された発言がこのトークン数たまるごとに要約する
+        "live_notes_max_tokens": 20000,  # 要約済みメモの合計がこれを超えたら1つにまとめ直す
+        "schedule_policy": "shortest",  # 処理順。shortest: 小さいファイルから / fifo: 更新時刻の古い順 / none: 並べ替えない
+        "schedule_size_metric": "bytes",  # shortest で比べる大きさ（bytes: ファイルサイズ / tokens: トークン数）
+        "priority_folders": ["urgent"],  # このサブフォルダ（input/urgent/ など）に置いたファイルを先に処理する
+        "priority_prefixes": ["至急_"],  # ファイル名がこれで始まるファイルを先に処理する
+        "schedule_max_wait_minutes": 60,  # これ以上待っているファイルは大きさに関係なく先に処理する（0で無効）
+        "index_enabled": True,  # 議事録と処理済みの文字起こしを全文検索インデックスに登録する（search_index.py で検索）
+        "index_folder": "index",  # 検索インデックスと件数の集計（manifest.json）の保存先
+        "duplicate_db_path": "archive_signatures.db",  # 処理済みの文字起こしの署名（SQLite）のパス。空にするとほぼ同じ内容の検出を行わない
+        "duplicate_threshold": 0.85,  # 処理済みの文字起こしとの推定類似度（0〜1）がこれ以上なら、ほぼ同じ内容とみなす
+        "duplicate_action": "flag"  # ほぼ同じ内容だった場合。flag: ログに警告して通常どおり作成 / skip: 作成せず既存の議事録を案内するファイルを出力
     }
     
     try:
@@ -86,118 +361,907 @@ def load_config():
             json.dump(default_config, f, indent=2, ensure_ascii=False)
         return default_config
 
-def create_minutes(transcript_text, config):
-    """議事録を生成"""
+CHUNK_PROMPT = (
+    "以下は長い会議の文字起こしの一部（{index}/{total}）です。"
+    "後で他の部分と統合して議事録を作成するため、この部分に含まれる参加者、議題、議論の要点、"
+    "決定事項、アクションアイテム（誰が・何を・いつまでに）、次回予定を漏れなく箇条書きで抽出してください。"
+)
+REDUCE_PREFIX = "以下は長い会議の文字起こしを分割して要約したものです。全体を統合して議事録を作成してください。\n\n"
+# 複数形式の議事録を作成する場合に、文字起こしを1回だけまとめる構造化メモ
+CONDENSE_PROMPT = (
+    "会議の文字起こしを、後で複数の形式の議事録に書き直すための構造化メモにまとめてください。"
+    "固有名詞・数値・日付・担当者・期限は省略せず、以下の見出しで箇条書きにしてください。\n\n"
+    "## 会議情報（日時・場所・参加者と役割）\n"
+    "## 議題と議論の要点（議題ごとに「発言者：要点」を時系列で）\n"
+    "## 決定事項（根拠を含む）\n"
+    "## アクションアイテム（担当・内容・期限）\n"
+    "## 次回予定\n"
+    "## その他（補足・懸念事項・専門用語）"
+)
+RENDER_PREFIX = "以下は会議の文字起こしを構造化メモにまとめたものです。この内容だけを使って、指示された形式で議事録を作成してください。\n\n"
+# 会議の進行中に、追記された区間ごとに作成する要約
+LIVE_PROMPT = (
+    "以下は進行中の会議の文字起こしのうち、新しく追記された部分（パート{index}）です。"
+    "後で他のパートと統合して議事録を作成するため、この部分に含まれる参加者、議題、議論の要点、"
+    "決定事項、アクションアイテム（誰が・何を・いつまでに）、次回予定を漏れなく箇条書きで抽出してください。"
+)
+LIVE_COMPACT_PROMPT = (
+    "以下は進行中の会議を区間ごとに要約したメモです。後で続きのメモと統合して議事録を作成するため、"
+    "固有名詞・数値・日付・担当者・期限を省略せず、時系列を保ったまま1つのメモにまとめてください。"
+)
+LIVE_MERGE_PREFIX = "以下は会議の進行中に区間ごとに要約したメモと、最後の区間の文字起こしです。全体を統合して議事録を作成してください。\n\n"
+
+def create_minutes(transcript_text, config, stream_to=None, job=None):
+    """議事録を生成
+    
+    stream_to（write/flushを持つファイル）を指定すると、最終的な議事録を受信しながら逐次書き込む。
+    job には処理中のファイル名を指定し、トークン使用量などを状態に記録する。
+    """
     prompt = config.get("system_prompt", "会議の文字起こしから議事録を作成してください。")
-    model = config.get("model", "gpt-4-turbo")
-    max_tokens = config.get("max_tokens", 4096)
-    temperature = config.get("temperature", 0.3)
+    threshold = config.get("chunk_threshold_tokens", 60000)
     
     # 文字数チェック（オプション）
     if len(transcript_text) > 200000:
         logging.warning(f"文字起こしが長大です: {len(transcript_text)}文字")
     
     try:
-        response = openai.chat.completions.create(
+        # 送信前にトークン数を数え、分割が必要か・どのモデルのコンテキストに収まるかを判断する
+        model = config.get("model", "gpt-4-turbo")
+        input_tokens = count_tokens(prompt, model) + count_tokens(transcript_text, model)
+        if threshold and input_tokens > threshold:
+            return create_minutes_chunked(transcript_text, config, stream_to=stream_to, job=job)
+        try:
+            plan_request(input_tokens, config)
+        except InputTooLongError as e:
+            if not threshold:
+                raise
+            logging.info(f"{e}。分割して要約します")
+            return create_minutes_chunked(transcript_text, config, stream_to=stream_to, job=job)
+        return request_completion(prompt, transcript_text, config, stream_to=stream_to, job=job, input_tokens=input_tokens)
+    except InputTooLongError as e:
+        logging.error(f"文字起こしが長すぎるため処理できません: {e}")
+        record_error(f"文字起こしが長すぎます: {job or ''}")
+        return None
+    except Exception as e:
+        logging.error(f"API呼び出しエラー: {e}")
+        record_error(f"API呼び出しエラー: {str(e)}")
+        return None
+
+def request_completion(prompt, content, config, max_tokens=None, stream_to=None, job=None, input_tokens=None):
+    """チャットAPIを1回呼び出して応答テキストを返す（失敗時は例外）
+    
+    モデルは入力のトークン数に応じて model_routes から選び、max_tokens は
+    コンテキストに収まる範囲に調整する（収まらない場合は InputTooLongError）。
+    """
+    if input_tokens is None:
+        default_model = config.get("model", "gpt-4-turbo")
+        input_tokens = count_tokens(prompt, default_model) + count_tokens(content, default_model)
+    model, max_tokens = plan_request(input_tokens, config, max_tokens)
+    if model != config.get("model", "gpt-4-turbo"):
+        logging.info(f"入力{input_tokens}トークンのため {model} を使用します（max_tokens: {max_tokens}）")
+    params = dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": content}
+        ],
+        temperature=config.get("temperature", 0.3),
+        max_tokens=max_tokens
+    )
+    estimated_tokens = input_tokens + max_tokens
+    rate_limiter.configure(config.get("rate_limits", {}))
+    client = get_api_client(config)
+    tracker = get_latency_tracker(model, stream_to is not None)
+    
+    def call(sending, **extra):
+        # レート制限の枠が空くまで待ってから呼び出す（429や一時的なエラーは待って再試行）
+        def attempt():
+            rate_limiter.acquire(model, estimated_tokens)
+            with sending():
+                return client.chat.completions.create(**params, **extra)
+        return call_with_retry(
+            attempt,
+            limiter=rate_limiter,
             model=model,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": transcript_text}
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
+            max_retries=config.get("max_retries", 6),
+            base_delay=config.get("retry_base_delay", 2),
+            max_delay=config.get("retry_max_delay", 60)
         )
+    
+    if stream_to is None:
+        response = hedged_call(
+            call, hedge_delay(config, tracker), tracker,
+            on_discard=lambda discarded: add_job_usage(job, discarded.usage, model)
+        )
+        add_job_usage(job, response.usage, model)
         return response.choices[0].message.content
+    
+    def open_stream(sending):
+        # 最初のトークンを受信するまで読み進めておく（ヘッジは最初のトークンまでの時間で判断する）
+        stream = call(sending, stream=True, stream_options={"include_usage": True})
+        received = []
+        for chunk in stream:
+            received.append(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                break
+        return stream, received
+    
+    # ストリーミング: 受信したトークンをそのまま書き込み、進捗を外部から確認できるようにする
+    started = time.monotonic()
+    first_token_at = None
+    pieces = []
+    stream, received = hedged_call(
+        open_stream, hedge_delay(config, tracker), tracker,
+        on_discard=lambda discarded: discarded[0].close()
+    )
+    for chunk in itertools.chain(received, stream):
+        if getattr(chunk, "usage", None):
+            add_job_usage(job, chunk.usage, model)
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.monotonic()
+            logging.info(f"最初のトークンを受信: {first_token_at - started:.2f}秒")
+            update_job(job, ttft_seconds=round(first_token_at - started, 2))
+        stream_to.write(text)
+        stream_to.flush()
+        pieces.append(text)
+    return "".join(pieces)
+
+def create_minutes_chunked(transcript_text, config, depth=0, stream_to=None, job=None):
+    """長い文字起こしを分割して並列に要約し、部分要約を統合して議事録を生成（map-reduce）"""
+    chunk_tokens = config.get("chunk_tokens", 12000)
+    chunks = split_transcript(transcript_text, chunk_tokens, config.get("chunk_overlap_tokens", 300))
+    parallelism = max(1, int(config.get("chunk_parallelism", 4)))
+    logging.info(f"長い文字起こしを{len(chunks)}個に分割して要約します（推定{estimate_tokens(transcript_text)}トークン）")
+    
+    # map: 各チャンクを並列に要約
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="chunk") as executor:
+        partials = list(executor.map(
+            lambda item: request_completion(
+                CHUNK_PROMPT.format(index=item[0] + 1, total=len(chunks)), item[1], config, job=job
+            ),
+            enumerate(chunks)
+        ))
+    combined = "\n\n".join(
+        f"## パート{i + 1}/{len(partials)}\n{partial}" for i, partial in enumerate(partials)
+    )
+    
+    # 部分要約の合計がまだ大きい場合はもう一段階要約する
+    if estimate_tokens(combined) > config.get("chunk_threshold_tokens", 60000) and depth < 2 and len(chunks) > 1:
+        return create_minutes_chunked(combined, config, depth + 1, stream_to=stream_to, job=job)
+    
+    # reduce: 部分要約を統合して指定形式の議事録にする
+    prompt = config.get("system_prompt", "会議の文字起こしから議事録を作成してください。")
+    return request_completion(prompt, REDUCE_PREFIX + combined, config, stream_to=stream_to, job=job)
+
+def get_result_cache(config):
+    """設定に応じた議事録キャッシュを返す（無効ならNone）"""
+    if not config.get("cache_enabled", False):
+        return None
+    folder = resolve_path(config.get("cache_folder", "cache"))
+    with status_lock:
+        if folder not in result_caches:
+            result_caches[folder] = ResultCache(
+                folder,
+                max_bytes=config.get("cache_max_mb", 200) * 1024 * 1024,
+                max_age_days=config.get("cache_max_age_days", 90)
+            )
+        return result_caches[folder]
+
+def get_job_ledger(config):
+    """設定に応じたジョブ台帳を返す（無効ならNone）"""
+    ledger_path = config.get("ledger_path")
+    if not ledger_path:
+        return None
+    ledger_path = resolve_path(ledger_path)
+    with status_lock:
+        if ledger_path not in job_ledgers:
+            job_ledgers[ledger_path] = JobLedger(ledger_path)
+        return job_ledgers[ledger_path]
+
+def get_lease_manager(config, watch_folder):
+    """設定に応じたリース管理を返す（無効ならNone）"""
+    if not config.get("lease_enabled", False):
+        return None
+    with status_lock:
+        if watch_folder not in lease_managers:
+            processing_folder = config.get("processing_folder")
+            processing_folder = resolve_path(processing_folder) if processing_folder else os.path.join(watch_folder, "processing")
+            lease_managers[watch_folder] = LeaseManager(
+                watch_folder,
+                processing_folder,
+                worker_id=config.get("worker_id") or None,
+                lease_ttl=config.get("lease_ttl", 300)
+            )
+        return lease_managers[watch_folder]
+
+def recover_leases(config, watch_folder):
+    """リースが切れたワーカーのファイルを監視フォルダへ戻し、リース管理を返す（無効ならNone）"""
+    leases = get_lease_manager(config, watch_folder)
+    if leases:
+        try:
+            leases.recover_expired()
+        except Exception as e:
+            logging.warning(f"リースの回収エラー: {e}")
+    return leases
+
+def get_file_scheduler(config, watch_folder):
+    """設定に応じた処理順の決定方法を返す"""
+    key = (
+        watch_folder,
+        config.get("schedule_policy", "shortest"),
+        config.get("schedule_size_metric", "bytes"),
+        tuple(config.get("priority_folders", ["urgent"])),
+        tuple(config.get("priority_prefixes", ["至急_"])),
+        config.get("schedule_max_wait_minutes", 60)
+    )
+    with status_lock:
+        if key not in file_schedulers:
+            file_schedulers[key] = FileScheduler(
+                watch_folder,
+                policy=key[1],
+                size_metric=key[2],
+                priority_folders=key[3],
+                priority_prefixes=key[4],
+                max_wait_minutes=key[5],
+                model=config.get("model", "gpt-4-turbo")
+            )
+        return file_schedulers[key]
+
+def get_search_index(config):
+    """設定に応じた全文検索インデックスを返す（無効ならNone）"""
+    if not config.get("index_enabled", False):
+        return None
+    folder = resolve_path(config.get("index_folder", "index"))
+    with status_lock:
+        if folder not in search_indexes:
+            search_indexes[folder] = SearchIndex(folder, {
+                "minutes": resolve_path(config["output_folder"]),
+                "transcript": resolve_path(config["processed_folder"])
+            })
+        return search_indexes[folder]
+
+def update_search_index(config, minutes_paths, transcript_path):
+    """保存した議事録とアーカイブした文字起こしを検索インデックスに登録し、件数の集計を更新"""
+    index = get_search_index(config)
+    if index is None:
+        return
+    try:
+        for path in minutes_paths:
+            index.add(path, "minutes")
+        index.add(transcript_path, "transcript")
+        index.write_manifest()
     except Exception as e:
-        logging.error(f"API呼び出しエラー: {e}")
-        status_data['error_count'] += 1
-        status_data['last_error'] = f"API呼び出しエラー: {str(e)}"
-        update_status_file()
+        logging.warning(f"検索インデックスの更新エラー: {e}")
+
+def sync_search_index(config):
+    """起動前に追加・削除されたファイルを検索インデックスに反映"""
+    index = get_search_index(config)
+    if index is None:
+        return
+    try:
+        index.sync()
+    except Exception as e:
+        logging.warning(f"検索インデックスの同期エラー: {e}")
+
+def get_duplicate_index(config):
+    """設定に応じた処理済みの文字起こしの署名の保存先を返す（無効ならNone）"""
+    db_path = config.get("duplicate_db_path")
+    if not db_path:
         return None
+    db_path = resolve_path(db_path)
+    with status_lock:
+        if db_path not in duplicate_indexes:
+            duplicate_indexes[db_path] = NearDuplicateIndex(db_path)
+        return duplicate_indexes[db_path]
+
+def find_duplicate(config, values, file_name, archive_path, output_path):
+    """処理済みの文字起こしからほぼ同じ内容のものを探す（無ければNone）"""
+    index = get_duplicate_index(config)
+    if index is None or values is None:
+        return None
+    try:
+        duplicate = index.find(values, config.get("duplicate_threshold", 0.85), exclude=archive_path)
+    except Exception as e:
+        logging.warning(f"類似ファイルの検索エラー: {e}")
+        return None
+    if duplicate is not None and output_path in duplicate["minutes_paths"]:
+        return None  # 同じ名前で置き直したファイル（議事録を作り直す）
+    if duplicate is not None:
+        logging.warning(
+            f"処理済みの文字起こしとほぼ同じ内容です: {file_name} ≒ {duplicate['file_name']}"
+            f"（類似度 {duplicate['similarity']:.0%}）"
+        )
+    return duplicate
+
+def register_transcript(config, file_name, archive_path, minutes_paths, values):
+    """アーカイブした文字起こしの署名を登録（以降のほぼ同じ内容の検出に使う）"""
+    index = get_duplicate_index(config)
+    if index is None or values is None:
+        return
+    try:
+        index.add(file_name, archive_path, minutes_paths, values)
+    except Exception as e:
+        logging.warning(f"署名の登録エラー: {e}")
+
+def sync_duplicate_index(config):
+    """署名が未登録の処理済みの文字起こし（この機能の導入前のものなど）を登録"""
+    index = get_duplicate_index(config)
+    if index is None:
+        return
+    processed_folder = resolve_path(config["processed_folder"])
+    output_folder = resolve_path(config["output_folder"])
+    try:
+        known = index.known_paths()
+        added = 0
+        for path in sorted(glob.glob(os.path.join(processed_folder, "*.txt"))):
+            if path in known:
+                continue
+            try:
+                transcript, _ = load_transcript(path)
+            except (OSError, UnicodeDecodeError):
+                continue
+            minutes_paths = glob.glob(glob.escape(output_path_for(path, output_folder)[:-len(".txt")]) + "*.txt")
+            index.add(os.path.basename(path), path, sorted(minutes_paths), signature(transcript))
+            added += 1
+        if added:
+            logging.info(f"処理済みの文字起こし{added}件の署名を登録しました")
+    except Exception as e:
+        logging.warning(f"署名の同期エラー: {e}")
+
+def write_duplicate_notice(output_path, file_name, duplicate):
+    """議事録の代わりに、ほぼ同じ内容の既存の議事録を案内するファイルを保存（成功時True）"""
+    lines = [
+        f"この文字起こしは処理済みの「{duplicate['file_name']}」とほぼ同じ内容のため"
+        f"（推定類似度 {duplicate['similarity']:.0%}）、議事録を作成していません。",
+        "",
+        "既存の議事録:"
+    ]
+    lines += [f"  {path}" for path in duplicate["minutes_paths"]] or ["  （見つかりません）"]
+    lines += [
+        f"処理済みの文字起こし: {duplicate['archive_path']}",
+        "",
+        "別の会議の場合は、duplicate_action を \"flag\" にしてからファイルを input に置き直してください。"
+    ]
+    try:
+        write_atomic(output_path, "\n".join(lines) + "\n")
+    except Exception as e:
+        logging.error(f"保存エラー: {output_path} - {e}")
+        record_error(f"保存エラー: {file_name}", count=False)
+        return False
+    logging.info(f"既存の議事録の案内を保存: {output_path}")
+    return True
+
+def get_api_client(config):
+    """設定に応じた接続プール付きのAPIクライアントを返す"""
+    key = (
+        config.get("request_timeout", 300),
+        config.get("connect_timeout", 10),
+        config.get("connection_pool_size", 20)
+    )
+    with status_lock:
+        if key not in api_clients:
+            api_clients[key] = create_client(config)
+        return api_clients[key]
+
+def get_latency_tracker(model, stream):
+    """モデル・ストリーミングの有無ごとの応答時間の記録を返す"""
+    with status_lock:
+        return latency_trackers.setdefault((model, stream), LatencyTracker())
+
+def hedge_delay(config, tracker):
+    """ヘッジ（同じリクエストの追加送信）までの待ち秒数（ヘッジしない場合はNone）"""
+    if not config.get("hedge_enabled", False):
+        return None
+    delay = tracker.percentile(config.get("hedge_percentile", 95), config.get("hedge_min_samples", 20))
+    if delay is None:
+        return None
+    return max(delay, config.get("hedge_min_delay", 1))
+
+def get_live_transcripts(config):
+    """設定に応じたライブ処理の状態管理を返す（無効ならNone）"""
+    if not config.get("live_enabled", False):
+        return None
+    folder = resolve_path(config.get("live_folder", "live"))
+    with status_lock:
+        if folder not in live_transcripts:
+            live_transcripts[folder] = LiveTranscripts(folder)
+        return live_transcripts[folder]
+
+def get_metrics(config):
+    """設定に応じたメトリクスの記録先を返す（無効ならNone）"""
+    metrics_path = config.get("metrics_path")
+    prometheus_path = config.get("prometheus_path")
+    port = config.get("metrics_port", 0)
+    if not metrics_path and not prometheus_path and not port:
+        return None
+    key = (
+        resolve_path(metrics_path) if metrics_path else None,
+        resolve_path(prometheus_path) if prometheus_path else None
+    )
+    with status_lock:
+        if key not in metrics_recorders:
+            recorder = MetricsRecorder(*key)
+            if port:
+                try:
+                    recorder.serve(port, config.get("metrics_host", "127.0.0.1"))
+                except OSError as e:
+                    logging.warning(f"メトリクスのHTTPサーバーを起動できません: {e}")
+            metrics_recorders[key] = recorder
+        return metrics_recorders[key]
+
+def record_metrics(file_name, job, success, config):
+    """1ファイル分の処理時間・トークン数・推定コストをログとメトリクスに記録"""
+    if job is None:
+        return
+    prices = config.get("model_prices")
+    models = {
+        model: dict(usage, cost_usd=round(estimate_cost({model: usage}, prices), 6))
+        for model, usage in job["usage_by_model"].items()
+    }
+    stages = {stage: round(seconds, 3) for stage, seconds in job["stage_seconds"].items()}
+    entry = {
+        "time": _format_iso(datetime.now()),
+        "file": file_name,
+        "result": "success" if success else "failed",
+        "bytes": job["bytes"],
+        "total_seconds": round(sum(job["stage_seconds"].values()), 3),
+        "stages": stages,
+        "ttft_seconds": job["ttft_seconds"],
+        "preprocess_saved_tokens": job["preprocess_saved_tokens"],
+        "duplicate_of": job["duplicate_of"],
+        "duplicate_similarity": job["duplicate_similarity"],
+        "prompt_tokens": job["prompt_tokens"],
+        "completion_tokens": job["completion_tokens"],
+        "cost_usd": round(sum(usage["cost_usd"] for usage in models.values()), 6),
+        "models": models
+    }
+    breakdown = ", ".join(f"{STAGE_LABELS.get(stage, stage).replace('中', '')} {seconds:.2f}秒" for stage, seconds in stages.items())
+    logging.info(
+        f"処理時間: {file_name} 合計{entry['total_seconds']:.2f}秒（{breakdown}）"
+        f" トークン: 入力{entry['prompt_tokens']} / 出力{entry['completion_tokens']} 推定コスト: ${entry['cost_usd']:.4f}"
+    )
+    recorder = get_metrics(config)
+    if recorder is None:
+        return
+    try:
+        recorder.record(entry)
+    except Exception as e:
+        logging.warning(f"メトリクスの記録エラー: {e}")
+
+def mark_ledger(ledger, job_id, state, **fields):
+    """ジョブ台帳の状態を更新（台帳のエラーで処理自体は止めない）"""
+    if ledger is None:
+        return
+    try:
+        ledger.mark(job_id, state, **fields)
+    except Exception as e:
+        logging.warning(f"ジョブ台帳の更新エラー: {e}")
+
+def job_usage(file_name):
+    """処理中ファイルのトークン使用量"""
+    with status_lock:
+        job = status_data['in_progress'].get(file_name) or {}
+        return {
+            "prompt_tokens": job.get("prompt_tokens", 0),
+            "completion_tokens": job.get("completion_tokens", 0)
+        }
 
 def process_file(file_path, output_folder, processed_folder, config):
     """単一ファイルを処理して移動"""
     logging.info(f"処理開始: {file_path}")
     
     # 進捗状況を更新
-    status_data['current_processing'] = os.path.basename(file_path)
-    update_status_file()
-    
-    # ファイルを読み込み
-    encodings = ['utf-8', 'shift_jis', 'cp932', 'euc_jp']
-    transcript = None
-    for encoding in encodings:
+    file_name = os.path.basename(file_path)
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = None
+    begin_job(file_name, size)
+    success = False
+    try:
+        success = _process_file(file_path, output_folder, processed_folder, config)
+        return success
+    finally:
+        # 処理完了（段階ごとの所要時間・トークン数を記録）
+        record_metrics(file_name, end_job(file_name), success, config)
+
+def read_transcript(file_path):
+    """文字起こしファイルを読み込む（失敗時はエラーを記録してNone）"""
+    try:
+        transcript, encoding = load_transcript(file_path)
+    except UnicodeDecodeError:
+        logging.error(f"全てのエンコーディングで読み込みに失敗: {file_path}")
+        record_error(f"エンコーディングエラー: {os.path.basename(file_path)}")
+        return None
+    except Exception as e:
+        logging.error(f"ファイル読み込みエラー: {file_path} - {e}")
+        record_error(f"ファイル読み込みエラー: {os.path.basename(file_path)}")
+        return None
+    logging.info(f"ファイルを読み込み: {file_path}（文字コード: {encoding}）")
+    return transcript
+
+def preprocess_transcript(transcript, config, file_name=None):
+    """APIに送る前に文字起こしを整形（タイムスタンプ・フィラー・重複の除去）し、削減したトークン数を記録"""
+    if not config.get("preprocess_enabled", False):
+        return transcript
+    cleaned = clean_transcript(
+        transcript,
+        timestamps=config.get("preprocess_timestamps", "strip"),
+        fillers=config.get("preprocess_fillers", DEFAULT_FILLERS),
+        merge_speakers=config.get("preprocess_merge_speakers", True),
+        dedupe=config.get("preprocess_dedupe", True)
+    )
+    model = config.get("model", "gpt-4-turbo")
+    before, after = count_tokens(transcript, model), count_tokens(cleaned, model)
+    saved = before - after
+    logging.info(f"前処理: {file_name} {before}→{after}トークン（{saved}トークン削減, {saved / before * 100 if before else 0:.1f}%）")
+    update_job(file_name, preprocess_saved_tokens=saved)
+    return cleaned
+
+def output_path_for(file_path, output_folder, format_name=None):
+    """文字起こしファイルに対応する議事録の出力パス（形式名を指定すると 〜_議事録_形式名.txt）"""
+    base_name = os.path.basename(file_path)
+    # タイムスタンプを追加してユニークなファイル名にする（オプション）
+    # timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # output_name = base_name.replace(".txt", f"_議事録_{timestamp}.txt")
+    suffix = f"_議事録_{format_name}.txt" if format_name else "_議事録.txt"
+    output_name = base_name.replace(".txt", suffix)
+    return os.path.join(output_folder, output_name)
+
+def write_outputs(outputs, file_name):
+    """出力パス → 議事録 の辞書をそれぞれ一時ファイル経由で保存"""
+    for output_path, minutes in outputs.items():
         try:
-            with open(file_path, "r", encoding=encoding) as f:
-                transcript = f.read()
-            break  # 成功したらループを抜ける
-        except UnicodeDecodeError:
-            continue  # 次のエンコーディングを試す
+            with AtomicFile(output_path) as out:
+                out.write(minutes)
         except Exception as e:
-            logging.error(f"ファイル読み込みエラー: {file_path} - {e}")
-            status_data['error_count'] += 1
-            status_data['last_error'] = f"ファイル読み込みエラー: {os.path.basename(file_path)}"
-            update_status_file()
+            logging.error(f"保存エラー: {output_path} - {e}")
+            record_error(f"保存エラー: {file_name}", count=False)
             return False
+        logging.info(f"議事録を保存: {output_path}")
+    return True
 
-    if transcript is None:
-        logging.error(f"全てのエンコーディングで読み込みに失敗: {file_path}")
-        status_data['error_count'] += 1
-        status_data['last_error'] = f"エンコーディングエラー: {os.path.basename(file_path)}"
-        update_status_file()
-        return False
+def archive_file(file_path, processed_folder):
+    """処理済みの文字起こしファイルを処理済みフォルダに移動"""
+    os.makedirs(processed_folder, exist_ok=True)
+    processed_path = os.path.join(processed_folder, os.path.basename(file_path))
     
-    # 議事録を生成
-    minutes = create_minutes(transcript, config)
-    if not minutes:
-        logging.error(f"議事録生成に失敗: {file_path}")
-        status_data['current_processing'] = None  # 処理完了
-        status_data['last_error'] = f"議事録生成に失敗: {os.path.basename(file_path)}"
-        update_status_file()
+    try:
+        shutil.move(file_path, processed_path)
+        logging.info(f"ファイルを移動: {file_path} → {processed_path}")
+        with status_lock:
+            status_data['processed_count'] += 1
+            status_data['last_processed'] = os.path.basename(file_path)
+        return True
+    except Exception as e:
+        logging.error(f"移動エラー: {e}")
+        record_error(f"ファイル移動エラー: {os.path.basename(file_path)}")
         return False
+
+def _process_file(file_path, output_folder, processed_folder, config):
+    """読み込み・生成・保存・移動の各段階を実行"""
+    # ファイルを読み込み
+    raw_transcript = read_transcript(file_path)
+    if raw_transcript is None:
+        return False
+    file_name = os.path.basename(file_path)
+    transcript = preprocess_transcript(raw_transcript, config, file_name)
     
     # 出力ファイルパスを決定
-    base_name = os.path.basename(file_path)
-    # タイムスタンプを追加してユニークなファイル名にする（オプション）
-    # timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # output_name = base_name.replace(".txt", f"_議事録_{timestamp}.txt")
-    output_name = base_name.replace(".txt", "_議事録.txt")
-    output_path = os.path.join(output_folder, output_name)
+    output_path = output_path_for(file_path, output_folder)
+    archive_path = os.path.join(processed_folder, file_name)
+    # ほぼ同じ内容の検出に使う署名（前処理の設定に左右されないよう元の文字起こしから作る）
+    values = signature(raw_transcript) if get_duplicate_index(config) else None
     
     # フォルダを作成
     os.makedirs(output_folder, exist_ok=True)
     
-    # 議事録を保存
+    # ジョブ台帳に登録（前回生成まで終わっていれば、その議事録から再開してAPIを呼ばない）
+    content_key = ResultCache.make_key(transcript, config)
+    ledger = get_job_ledger(config)
+    job_id, ledger_state, saved_minutes = None, None, None
+    if ledger:
+        try:
+            job_id, ledger_state, saved_minutes = ledger.start(file_name, content_key, len(transcript.encode("utf-8")))
+        except Exception as e:
+            logging.warning(f"ジョブ台帳の登録エラー: {e}")
+            ledger = None
+    
+    formats = load_output_formats(config)
+    duplicate = find_duplicate(config, values, file_name, archive_path, output_path) if saved_minutes is None else None
+    if duplicate is not None:
+        update_job(file_name, duplicate_of=duplicate["file_name"], duplicate_similarity=duplicate["similarity"])
+    if saved_minutes is not None:
+        logging.info(f"ジョブ台帳から再開: {file_path}（{ledger_state}）")
+        # 複数形式の場合は 出力パス → 議事録 をJSONで保存している
+        outputs = json.loads(saved_minutes) if formats else {output_path: saved_minutes}
+        if ledger_state != "written" or not all(os.path.exists(path) for path in outputs):
+            update_job(file_name, stage="writing")
+            if not write_outputs(outputs, file_name):
+                return False
+            mark_ledger(ledger, job_id, "written", output_path="\n".join(outputs))
+    elif duplicate is not None and config.get("duplicate_action", "flag") == "skip":
+        # APIを呼ばず、既存の議事録を案内するファイルだけを出力する
+        update_job(file_name, stage="writing")
+        if not write_duplicate_notice(output_path, file_name, duplicate):
+            mark_ledger(ledger, job_id, "failed", error="保存エラー")
+            return False
+        mark_ledger(ledger, job_id, "written", output_path=output_path)
+    elif formats:
+        if not _generate_formats(file_path, output_folder, transcript, formats, config, ledger, job_id):
+            return False
+    else:
+        minutes = _generate_and_save(file_path, output_path, transcript, content_key, config, ledger, job_id)
+        if minutes is None:
+            return False
+    
+    # 処理済みフォルダに移動
+    update_job(file_name, stage="archiving")
+    if not archive_file(file_path, processed_folder):
+        return False
+    mark_ledger(ledger, job_id, "archived")
+    discard_live(file_path, config)
+    if duplicate is not None and config.get("duplicate_action", "flag") == "skip":
+        update_search_index(config, [output_path], archive_path)
+        # 議事録は既存のものを指すように登録する
+        register_transcript(config, file_name, archive_path, duplicate["minutes_paths"], values)
+        return True
+    minutes_paths = [output_path_for(file_path, output_folder, name) for name, _ in formats] if formats else [output_path]
+    update_search_index(config, minutes_paths, archive_path)
+    register_transcript(config, file_name, archive_path, minutes_paths, values)
+    return True
+
+def _generate_and_save(file_path, output_path, transcript, content_key, config, ledger, job_id):
+    """議事録を生成（またはキャッシュから取得）して保存し、議事録を返す（失敗時はNone）"""
+    # 議事録を生成して保存（一時ファイルに書き込み、完了後に置き換えるため途中で落ちても壊れたファイルは残らない）
+    stream = config.get("stream", False)
+    cache = get_result_cache(config)
+    cached = cache.get(content_key) if cache else None
+    file_name = os.path.basename(file_path)
+    update_job(file_name, stage="writing" if cached is not None else "generating")
+    mark_ledger(ledger, job_id, "in_flight")
+    minutes = None
     try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(minutes)
-        logging.info(f"議事録を保存: {output_path}")
+        with AtomicFile(output_path) as out:
+            if cached is not None:
+                # 同じ内容・設定で生成済みの議事録を再利用（API呼び出しなし）
+                logging.info(f"キャッシュから議事録を再利用: {file_path}")
+                minutes = cached
+                out.write(minutes)
+            else:
+                # 会議中に要約済みであれば、残りの発言と合わせて統合するだけでよい
+                content = live_merge_input(file_path, config) or transcript
+                minutes = create_minutes(content, config, stream_to=out if stream else None, job=file_name)
+                if not minutes:
+                    out.discard()
+                else:
+                    # 出力より先に台帳へ保存しておき、この後で止まっても再生成しない
+                    mark_ledger(ledger, job_id, "generated", minutes=minutes, **job_usage(file_name))
+                    if not stream:
+                        update_job(file_name, stage="writing")
+                        out.write(minutes)
     except Exception as e:
         logging.error(f"保存エラー: {output_path} - {e}")
-        status_data['current_processing'] = None  # 処理完了
-        status_data['last_error'] = f"保存エラー: {os.path.basename(file_path)}"
-        update_status_file()
-        return False
+        record_error(f"保存エラー: {file_name}", count=False)
+        if not minutes:
+            mark_ledger(ledger, job_id, "failed", error=f"保存エラー: {e}")
+        return None
     
-    # 処理済みフォルダに移動
-    os.makedirs(processed_folder, exist_ok=True)
-    processed_path = os.path.join(processed_folder, base_name)
+    if not minutes:
+        logging.error(f"議事録生成に失敗: {file_path}")
+        record_error(f"議事録生成に失敗: {file_name}", count=False)
+        mark_ledger(ledger, job_id, "failed", error="議事録生成に失敗")
+        return None
+    logging.info(f"議事録を保存: {output_path}")
+    mark_ledger(ledger, job_id, "written", output_path=output_path, minutes=minutes, **job_usage(file_name))
     
+    if cache:
+        if cached is None:
+            try:
+                cache.put(content_key, minutes)
+            except Exception as e:
+                logging.warning(f"キャッシュ保存エラー: {e}")
+        update_status(cache_hits=cache.hits, cache_misses=cache.misses)
+    return minutes
+
+def load_output_formats(config):
+    """output_formats に指定したテンプレートを (形式名, プロンプト) のリストで返す"""
+    formats = []
+    prompt_folder = resolve_path(config.get("prompt_folder", "プロンプト例"))
+    for name in config.get("output_formats") or []:
+        # 形式名（プロンプト例/<形式名>.txt）またはテンプレートファイルのパスを指定できる
+        path = resolve_path(name) if name.endswith(".txt") else os.path.join(prompt_folder, f"{name}.txt")
+        try:
+            prompt, _ = load_transcript(path)
+        except (OSError, UnicodeDecodeError) as e:
+            logging.error(f"テンプレートを読み込めません: {path} - {e}")
+            continue
+        formats.append((os.path.splitext(os.path.basename(path))[0], prompt.strip()))
+    return formats
+
+def condense_transcript(transcript, config, cache, file_name):
+    """文字起こしを複数形式で共有する構造化メモにまとめる（失敗時はNone）"""
+    condense_config = dict(config, system_prompt=config.get("condense_prompt") or CONDENSE_PROMPT, output_formats=None)
+    key = ResultCache.make_key(transcript, condense_config)
+    notes = cache.get(key) if cache else None
+    if notes is not None:
+        logging.info(f"キャッシュから構造化メモを再利用: {file_name}")
+        return notes
+    # 長い文字起こしの分割やモデルの選択は通常の議事録と同じ
+    notes = create_minutes(transcript, condense_config, job=file_name)
+    if notes and cache:
+        try:
+            cache.put(key, notes)
+        except Exception as e:
+            logging.warning(f"キャッシュ保存エラー: {e}")
+    return notes
+
+def render_format(format_name, prompt, notes, config, file_name):
+    """構造化メモから1つの形式の議事録を作成（失敗時はNone）"""
     try:
-        shutil.move(file_path, processed_path)
-        logging.info(f"ファイルを移動: {file_path} → {processed_path}")
-        status_data['processed_count'] += 1
-        status_data['last_processed'] = os.path.basename(file_path)  # 追加
-        status_data['current_processing'] = None  # 処理完了
-        update_status_file()
-        return True
+        return request_completion(prompt, RENDER_PREFIX + notes, config, job=file_name)
     except Exception as e:
-        logging.error(f"移動エラー: {e}")
-        status_data['error_count'] += 1
-        status_data['last_error'] = f"ファイル移動エラー: {os.path.basename(file_path)}"
-        status_data['current_processing'] = None  # 処理完了
-        update_status_file()
+        logging.error(f"API呼び出しエラー（{format_name}）: {e}")
+        record_error(f"API呼び出しエラー: {str(e)}")
+        return None
+
+def _generate_formats(file_path, output_folder, transcript, formats, config, ledger, job_id):
+    """文字起こしを1回だけ構造化メモにまとめ、そこから各形式の議事録を並列に作成して保存"""
+    file_name = os.path.basename(file_path)
+    cache = get_result_cache(config)
+    update_job(file_name, stage="generating")
+    mark_ledger(ledger, job_id, "in_flight")
+    
+    # 形式ごとにキャッシュを確認（テンプレートを追加した場合は新しい形式だけ作成する）
+    outputs = {}
+    pending = []
+    for format_name, prompt in formats:
+        output_path = output_path_for(file_path, output_folder, format_name)
+        key = ResultCache.make_key(transcript, dict(config, system_prompt=prompt, output_formats=[format_name]))
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            logging.info(f"キャッシュから議事録を再利用: {file_path}（{format_name}）")
+            outputs[output_path] = cached
+        else:
+            pending.append((format_name, prompt, output_path, key))
+    
+    if pending:
+        notes = condense_transcript(live_merge_input(file_path, config) or transcript, config, cache, file_name)
+        if not notes:
+            logging.error(f"構造化メモの作成に失敗: {file_path}")
+            mark_ledger(ledger, job_id, "failed", error="構造化メモの作成に失敗")
+            return False
+        logging.info(f"構造化メモから{len(pending)}形式の議事録を作成します: {file_path}")
+        with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="format") as executor:
+            results = list(executor.map(
+                lambda item: render_format(item[0], item[1], notes, config, file_name), pending
+            ))
+        for (format_name, _, output_path, key), minutes in zip(pending, results):
+            if not minutes:
+                logging.error(f"議事録生成に失敗: {file_path}（{format_name}）")
+                record_error(f"議事録生成に失敗: {file_name}（{format_name}）", count=False)
+                mark_ledger(ledger, job_id, "failed", error=f"議事録生成に失敗（{format_name}）")
+                return False
+            outputs[output_path] = minutes
+            if cache:
+                try:
+                    cache.put(key, minutes)
+                except Exception as e:
+                    logging.warning(f"キャッシュ保存エラー: {e}")
+    
+    # 出力より先に台帳へ保存しておき、この後で止まっても再生成しない
+    mark_ledger(ledger, job_id, "generated", minutes=json.dumps(outputs, ensure_ascii=False), **job_usage(file_name))
+    update_job(file_name, stage="writing")
+    if not write_outputs(outputs, file_name):
         return False
+    mark_ledger(ledger, job_id, "written", output_path="\n".join(outputs), **job_usage(file_name))
+    if cache:
+        update_status(cache_hits=cache.hits, cache_misses=cache.misses)
+    return True
+
+def update_live(file_path):
+    """書き込み中のファイルに追記された発言を読み込み、live_segment_tokens 以上たまっていれば要約する"""
+    config = load_config()
+    live = get_live_transcripts(config)
+    if live is None:
+        return
+    file_name = os.path.basename(file_path)
+    with live.lock_for(file_name):
+        state = live.load(file_name)
+        try:
+            added = live.read_new(file_path, state)
+        except (OSError, ValueError) as e:
+            logging.warning(f"ライブ処理の読み込みエラー: {file_path} - {e}")
+            return
+        if added:
+            live.save(file_name, state)
+            _summarize_live(file_name, state, config, live)
+
+def _summarize_live(file_name, state, config, live):
+    """まだ要約していない発言を区間ごとに要約してメモに加え、状態を保存する"""
+    model = config.get("model", "gpt-4-turbo")
+    segment_tokens = config.get("live_segment_tokens", 3000)
+    if count_tokens(state["pending"], model) < segment_tokens:
+        return
+    # 要約が追いついていない場合は複数の区間に分けて並列に要約する
+    segments = split_transcript(state["pending"], segment_tokens)
+    first_index = state["segments"] + 1
+    job_name = f"live:{file_name}"
+    begin_job(job_name, state["offset"])
+    update_job(job_name, stage="live")
+    
+    def summarize(item):
+        index, segment = item
+        segment = preprocess_transcript(segment, config, job_name)
+        if not segment.strip():
+            return None
+        return request_completion(LIVE_PROMPT.format(index=first_index + index), segment, config, job=job_name)
+    
+    try:
+        parallelism = max(1, int(config.get("chunk_parallelism", 4)))
+        with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="live") as executor:
+            notes = list(executor.map(summarize, enumerate(segments)))
+        state["notes"] += [note for note in notes if note]
+        state["segments"] += len(segments)
+        state["pending"] = ""
+        logging.info(f"ライブ要約: {file_name} パート{first_index}〜{state['segments']}を要約しました（{state['offset']}バイトまで）")
+        
+        # メモが大きくなりすぎたら1つにまとめ直し、最後の統合の入力を一定に保つ
+        combined = "\n\n".join(state["notes"])
+        if len(state["notes"]) > 1 and count_tokens(combined, model) > config.get("live_notes_max_tokens", 20000):
+            state["notes"] = [request_completion(LIVE_COMPACT_PROMPT, combined, config, job=job_name)]
+            logging.info(f"ライブ要約: {file_name} のメモを1つにまとめ直しました")
+    except Exception as e:
+        # 要約できなかった発言は pending に残し、次回（または最後の統合時）に再度要約する
+        logging.error(f"ライブ要約エラー: {file_name} - {e}")
+        record_error(f"ライブ要約エラー: {file_name}", count=False)
+    finally:
+        job = end_job(job_name)
+        for model_name, usage in job["usage_by_model"].items():
+            totals = state["usage_by_model"].setdefault(model_name, {"prompt_tokens": 0, "completion_tokens": 0})
+            totals["prompt_tokens"] += usage["prompt_tokens"]
+            totals["completion_tokens"] += usage["completion_tokens"]
+        live.save(file_name, state)
+
+def live_merge_input(file_path, config):
+    """ライブ処理で要約済みのメモがあれば、残りの発言を読み込んで最後の統合に渡す入力を返す（無ければNone）"""
+    live = get_live_transcripts(config)
+    file_name = os.path.basename(file_path)
+    if live is None or not live.exists(file_name):
+        return None
+    with live.lock_for(file_name):
+        state = live.load(file_name)
+        try:
+            live.read_new(file_path, state, final=True)
+        except (OSError, ValueError) as e:
+            logging.warning(f"ライブ処理の読み込みエラーのため通常どおり処理します: {file_path} - {e}")
+            return None
+        _summarize_live(file_name, state, config, live)
+        if not state["notes"]:
+            return None
+        # 会議中の要約に使ったトークン数もこのファイルの記録に含める（統合を再試行しても二重に数えないよう消しておく）
+        for model, usage in state["usage_by_model"].items():
+            add_job_usage(file_name, SimpleNamespace(**usage), model)
+        if state["usage_by_model"]:
+            state["usage_by_model"] = {}
+            live.save(file_name, state)
+        parts = [f"## パート{i + 1}\n{note}" for i, note in enumerate(state["notes"])]
+        tail = preprocess_transcript(state["pending"], config, f"live:{file_name}") if state["pending"].strip() else ""
+        if tail.strip():
+            parts.append(f"## 最後の区間の文字起こし\n{tail}")
+        logging.info(f"ライブ要約済みのメモ{len(state['notes'])}件から議事録を作成します: {file_path}")
+        return LIVE_MERGE_PREFIX + "\n\n".join(parts)
+
+def discard_live(file_path, config):
+    """議事録を作成し終えたファイルのライブ処理の状態を削除"""
+    live = get_live_transcripts(config)
+    if live is not None:
+        live.discard(os.path.basename(file_path))
 
 def resolve_path(config_path):
     """絶対パスと相対パスを適切に解決する"""
@@ -206,8 +1270,11 @@ def resolve_path(config_path):
     else:
         return os.path.join(os.path.dirname(os.path.abspath(__file__)), config_path)
 
-def check_and_process():
-    """新しいファイルをチェックして処理"""
+def check_and_process(file_paths=None):
+    """新しいファイルをチェックして処理
+    
+    file_paths を指定した場合は、書き込み完了を確認済みのファイルとしてそのまま処理する。
+    """
     config = load_config()
     
     # パス参照の解決（絶対パスと相対パスの両方をサポート）
@@ -216,63 +1283,221 @@ def check_and_process():
     processed_folder = resolve_path(config["processed_folder"])
     
     # 状態を更新
-    status_data['last_check'] = datetime.now()
-    # 直接分単位で指定
-    status_data['next_check'] = datetime.now() + timedelta(minutes=config["check_interval"])
-    update_status_file()
+    if file_paths is None:
+        # 直接分単位で指定
+        update_status(
+            last_check=datetime.now(),
+            next_check=datetime.now() + timedelta(minutes=config["check_interval"])
+        )
+    else:
+        update_status(last_check=datetime.now())
     
     # 監視フォルダをチェック
     if not os.path.exists(watch_folder):
         logging.warning(f"監視フォルダが存在しません: {watch_folder}")
-        status_data['last_error'] = f"監視フォルダが存在しません: {watch_folder}"
-        update_status_file()
+        record_error(f"監視フォルダが存在しません: {watch_folder}", count=False)
         return
     
-    # txtファイルを検索
-    txt_files = glob.glob(os.path.join(watch_folder, "*.txt"))
+    # 停止した他のワーカーが確保したままのファイルを監視フォルダへ戻す
+    leases = recover_leases(config, watch_folder)
+    
+    if file_paths is None:
+        # txtファイルを検索（優先処理用のサブフォルダを含む）
+        txt_files = pending_files(watch_folder, config.get("priority_folders", ["urgent"]))
+        settle_wait = 5  # ファイルが完全に書き込まれるのを待つ秒数
+    else:
+        txt_files = list(file_paths)
+        settle_wait = 0
     
     if not txt_files:
         logging.info("新しいファイルはありません")
         return
     
     logging.info(f"{len(txt_files)}個のファイルを発見")
+    # 優先度・schedule_policy に従って処理順を決める（並列処理でも先に投入したものから処理される）
+    txt_files = get_file_scheduler(config, watch_folder).order(txt_files)
+    
+    max_concurrency = max(1, int(config.get("max_concurrency", 1)))
+    if max_concurrency == 1:
+        for file_path in txt_files:
+            wait_and_process(file_path, output_folder, processed_folder, config, settle_wait, leases)
+        return
     
-    for file_path in txt_files:
-        # ファイルが完全に書き込まれるのを待つ
-        time.sleep(5)
-        process_file(file_path, output_folder, processed_folder, config)
+    # 複数ファイルを並列に処理（処理時間の大半はAPIの応答待ちのため）
+    logging.info(f"最大{max_concurrency}件を並列処理します")
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="worker") as executor:
+        futures = {
+            executor.submit(wait_and_process, file_path, output_folder, processed_folder, config, settle_wait, leases): file_path
+            for file_path in txt_files
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"ワーカーエラー: {futures[future]} - {e}")
+                record_error(f"ワーカーエラー: {os.path.basename(futures[future])}")
+
+def wait_and_process(file_path, output_folder, processed_folder, config, settle_wait=5, leases=None, on_release=None):
+    """書き込み完了を待ってからファイルを処理（leases を指定した場合は確保できたファイルのみ）
+
+    処理できずに監視フォルダへ戻したファイルは on_release に戻した先のパスを渡す。
+    """
+    if settle_wait:
+        time.sleep(settle_wait)
+    if leases is None:
+        return process_file(file_path, output_folder, processed_folder, config)
+    
+    claimed_path = leases.claim(file_path)
+    if claimed_path is None:
+        logging.info(f"他のワーカーが処理中のためスキップ: {file_path}")
+        return False
+    try:
+        return process_file(claimed_path, output_folder, processed_folder, config)
+    finally:
+        # 処理できなかったファイルは次回の処理対象になるよう元のフォルダ（優先処理用のサブフォルダを含む）へ戻す
+        released_path = leases.release(claimed_path, os.path.dirname(file_path))
+        if released_path and on_release:
+            on_release(released_path)
+
+def dispatch_files(executor, queued, in_flight, max_concurrency, on_release=None):
+    """空いているワーカーの数だけ、処理順の先頭から書き込み完了済みのファイルを投入し、残りを返す"""
+    config = load_config()
+    watch_folder = resolve_path(config["watch_folder"])
+    output_folder = resolve_path(config["output_folder"])
+    processed_folder = resolve_path(config["processed_folder"])
+    update_status(last_check=datetime.now())
+    leases = get_lease_manager(config, watch_folder)
+    # 処理中のファイルの後から届いたファイルも含めて、優先度・schedule_policy の順に並べ直す
+    ordered = get_file_scheduler(config, watch_folder).order(queued)
+    free = max_concurrency - len(in_flight)
+    for file_path in ordered[:free]:
+        in_flight[file_path] = executor.submit(
+            wait_and_process, file_path, output_folder, processed_folder, config, 0, leases, on_release
+        )
+    return ordered[free:]
+
+def poll_loop(interval):
+    """check_intervalごとにフォルダをチェックして処理"""
+    while True:
+        try:
+            check_and_process()
+        except Exception as e:
+            logging.error(f"エラー: {e}")
+            record_error(str(e))
+        
+        logging.info(f"次のチェックまで{interval}分待機...")
+        time.sleep(interval * 60)  # 分→秒に変換
+
+def watch_loop(config):
+    """フォルダの変更を検知し、書き込みが完了したファイルから順に処理"""
+    interval = config["check_interval"]
+    watch_folder = resolve_path(config["watch_folder"])
+    os.makedirs(watch_folder, exist_ok=True)
+    priority_folders = config.get("priority_folders", ["urgent"])
+    for name in priority_folders:
+        os.makedirs(os.path.join(watch_folder, name), exist_ok=True)
+    live_enabled = config.get("live_enabled", False)
+    watcher = FolderWatcher(
+        watch_folder,
+        settle_seconds=config.get("settle_seconds", 5),
+        poll_interval=config.get("watch_poll_interval", 2),
+        growing_after=config.get("live_start_seconds", 60) if live_enabled else None,
+        growing_settle_seconds=config.get("live_settle_seconds", 120) if live_enabled else None,
+        subfolders=priority_folders
+    )
+    # 書き込みが完了したファイルは監視ループを止めないよう常駐のワーカーで処理する
+    max_concurrency = max(1, int(config.get("max_concurrency", 1)))
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="worker")
+    queued = []  # 空きワーカーを待っているファイル（空いた時点で処理順の先頭から投入する）
+    in_flight = {}  # 処理中のファイル → Future
+    # 追記中のファイルの要約は監視ループを止めないよう別スレッドで行う（ファイルごとに1つずつ）
+    live_executor = ThreadPoolExecutor(max_workers=max(1, int(config.get("max_concurrency", 1))), thread_name_prefix="live") if live_enabled else None
+    live_futures = {}
+    next_full_scan = time.monotonic()
+    try:
+        while True:
+            if time.monotonic() >= next_full_scan:
+                # 取りこぼし対策の定期チェック（処理に失敗して残ったファイルもここで再処理）
+                # 停止した他のワーカーが確保したままのファイルを監視フォルダへ戻す
+                recover_leases(config, watch_folder)
+                watcher.reset()
+                next_full_scan = time.monotonic() + interval * 60
+                update_status(
+                    last_check=datetime.now(),
+                    next_check=datetime.now() + timedelta(minutes=interval)
+                )
+            ready = watcher.scan()
+            if live_executor is not None:
+                for path in watcher.growing():
+                    if path not in live_futures or live_futures[path].done():
+                        live_futures[path] = live_executor.submit(update_live, path)
+                for path in [path for path, future in live_futures.items() if future.done()]:
+                    del live_futures[path]
+            queued += [path for path in ready if path not in in_flight and path not in queued]
+            for path in [path for path, future in in_flight.items() if future.done()]:
+                try:
+                    in_flight.pop(path).result()
+                except Exception as e:
+                    logging.error(f"ワーカーエラー: {path} - {e}")
+                    record_error(f"ワーカーエラー: {os.path.basename(path)}")
+            if queued and len(in_flight) < max_concurrency:
+                try:
+                    queued = dispatch_files(executor, queued, in_flight, max_concurrency, watcher.mark_released)
+                except Exception as e:
+                    logging.error(f"エラー: {e}")
+                    record_error(str(e))
+            timeout = max(0, next_full_scan - time.monotonic())
+            if in_flight:
+                # 処理が終わったら待っているファイルを投入できるよう、イベントが無くても定期的に確認する
+                timeout = min(timeout, watcher.poll_interval)
+            watcher.wait(timeout)
+    finally:
+        watcher.close()
+        executor.shutdown(wait=True, cancel_futures=True)
+        if live_executor is not None:
+            live_executor.shutdown(wait=True, cancel_futures=True)
 
 def main():
     """メイン処理ループ"""
+    global publish_status
     config = load_config()
+    publish_status = True
     interval = config["check_interval"]  # これは分単位の値
     
-    # 状態を初期化
-    status_data['is_running'] = True
-    status_data['processed_count'] = 0
-    status_data['error_count'] = 0
-    update_status_file()
+    # 状態を初期化（累計の件数はジョブ台帳から引き継ぐ）
+    processed_count, error_count = 0, 0
+    ledger = get_job_ledger(config)
+    if ledger:
+        counts = ledger.counts()
+        processed_count, error_count = counts["processed"], counts["failed"]
+    update_status(is_running=True, processed_count=processed_count, error_count=error_count)
+    
+    # 起動していない間に増減したファイルは別スレッドで検索インデックスに反映する
+    threading.Thread(target=sync_search_index, args=(config,), name="index-sync", daemon=True).start()
+    threading.Thread(target=sync_duplicate_index, args=(config,), name="duplicate-sync", daemon=True).start()
     
-    logging.info(f"自動処理を開始（チェック間隔: {interval}分）")
+    watch_mode = config.get("watch_mode", "poll")
+    logging.info(f"自動処理を開始（チェック間隔: {interval}分, 監視方式: {watch_mode}）")
     
     try:
-        while True:
-            try:
-                check_and_process()
-            except Exception as e:
-                logging.error(f"エラー: {e}")
-                status_data['error_count'] += 1
-                status_data['last_error'] = str(e)
-                update_status_file()
-            
-            logging.info(f"次のチェックまで{interval}分待機...")
-            time.sleep(interval * 60)  # 分→秒に変換
+        if watch_mode == "event":
+            watch_loop(config)
+        else:
+            poll_loop(interval)
     finally:
-        status_data['is_running'] = False
-        status_data['next_check'] = None
-        update_status_file()
+        for leases in lease_managers.values():
+            leases.close()
+        for recorder in metrics_recorders.values():
+            recorder.close()
+        for index in search_indexes.values():
+            index.close()
+        for index in duplicate_indexes.values():
+            index.close()
+        update_status(is_running=False, next_check=None)
 
 if __name__ == "__main__":
+    # ロギング設定（import した場合は呼び出し側で設定する）
+    setup_logging(load_config())
     try:
         main()
     except KeyboardInterrupt:
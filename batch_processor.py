@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""溜まった文字起こしをまとめてBatch APIに送信し、結果を output/ と archive/ に振り分ける
+
+使い方:
+  python batch_processor.py              # input/ の全ファイルを1つのバッチとして送信し、完了まで待機
+  python batch_processor.py --no-wait    # 送信だけ行う（結果は --resume で回収）
+  python batch_processor.py --resume     # 送信済みで未回収のバッチをすべて回収
+
+ローカルのモックサーバーで試す場合は OPENAI_BASE_URL=http://127.0.0.1:8000/v1 を設定する。
+"""
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import logging
+import argparse
+from datetime import datetime
+
+from atomic_file import write_atomic
+from auto_processor import (
+    load_config, resolve_path, read_transcript, preprocess_transcript, output_path_for, archive_file,
+    get_result_cache, get_api_client, update_search_index, record_error, setup_logging,
+    get_duplicate_index, register_transcript
+)
+from model_router import InputTooLongError, plan_request
+from near_duplicate import signature
+from result_cache import ResultCache
+from transcript_chunker import count_tokens
+
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def build_request(custom_id, transcript, config, input_tokens):
+    """1ファイル分のバッチリクエスト行を作成（コンテキストに収まらない場合は InputTooLongError）"""
+    model, max_tokens = plan_request(input_tokens, config)
+    prompt = config.get("system_prompt", "会議の文字起こしから議事録を作成してください。")
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": transcript}
+            ],
+            "temperature": config.get("temperature", 0.3),
+            "max_tokens": max_tokens
+        }
+    }
+
+
+def claim_file(file_path, pending_folder):
+    """ファイルを退避フォルダへリネームして確保し、確保後のパスを返す（他のワーカーが先に確保した場合はNone）"""
+    claimed_path = os.path.join(pending_folder, os.path.basename(file_path))
+    try:
+        os.rename(file_path, claimed_path)
+    except FileNotFoundError:
+        return None  # 通常処理のワーカーが先に確保した
+    except OSError as e:
+        logging.info(f"ファイルを確保できません: {file_path} - {e}")
+        return None
+    return claimed_path
+
+
+def save_minutes(custom_id, pending_path, minutes, config):
+    """議事録を保存して元ファイルをアーカイブ（成功時True）"""
+    output_folder = resolve_path(config["output_folder"])
+    processed_folder = resolve_path(config["processed_folder"])
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = output_path_for(pending_path, output_folder)
+    try:
+        write_atomic(output_path, minutes)
+        logging.info(f"議事録を保存: {output_path}")
+    except Exception as e:
+        logging.error(f"保存エラー: {output_path} - {e}")
+        record_error(f"保存エラー: {custom_id}", count=False)
+        return False
+    if not archive_file(pending_path, processed_folder):
+        return False
+    archive_path = os.path.join(processed_folder, custom_id)
+    update_search_index(config, [output_path], archive_path)
+    if get_duplicate_index(config):
+        transcript = read_transcript(archive_path)
+        if transcript is not None:
+            register_transcript(config, custom_id, archive_path, [output_path], signature(transcript))
+    return True
+
+
+def write_state(state_path, state):
+    write_atomic(state_path, json.dumps(state, indent=2, ensure_ascii=False))
+
+
+def submit_batch(config):
+    """未処理ファイルをJSONLにまとめてバッチを作成し、状態ファイルのパスを返す（対象なしはNone）
+
+    ファイルは読み込む前に退避フォルダへ移して確保し、送信前に状態ファイルを保存するため、
+    通常処理と二重に処理されず、送信後に止まっても --resume で回収できる。
+    """
+    watch_folder = resolve_path(config["watch_folder"])
+    batch_folder = resolve_path(config.get("batch_folder", "batch"))
+    threshold = config.get("chunk_threshold_tokens", 60000)
+    model = config.get("model", "gpt-4-turbo")
+    prompt_tokens = count_tokens(config.get("system_prompt", "会議の文字起こしから議事録を作成してください。"), model)
+    cache = get_result_cache(config)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    pending_folder = os.path.join(batch_folder, f"batch_{stamp}")
+    os.makedirs(pending_folder, exist_ok=True)
+
+    lines = []
+    files = {}
+    cache_keys = {}
+    for file_path in sorted(glob.glob(os.path.join(watch_folder, "*.txt"))):
+        pending_path = claim_file(file_path, pending_folder)
+        if pending_path is None:
+            continue
+        custom_id = os.path.basename(file_path)
+        transcript = read_transcript(pending_path)
+        request = None
+        if transcript is not None:
+            transcript = preprocess_transcript(transcript, config, custom_id)
+            key = ResultCache.make_key(transcript, config)
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                # 同じ内容・設定で生成済みのものは送信せずにキャッシュから保存する
+                logging.info(f"キャッシュから議事録を再利用: {file_path}")
+                if save_minutes(custom_id, pending_path, cached, config):
+                    continue
+            else:
+                input_tokens = prompt_tokens + count_tokens(transcript, model)
+                if threshold and input_tokens > threshold:
+                    # 分割要約が必要な長さのものは通常処理に任せる
+                    logging.info(f"長いためバッチの対象外にします: {file_path}")
+                else:
+                    try:
+                        request = build_request(custom_id, transcript, config, input_tokens)
+                    except InputTooLongError as e:
+                        logging.info(f"バッチの対象外にします: {file_path} - {e}")
+        if request is None:
+            # 対象外のファイルは通常処理で扱えるよう監視フォルダへ戻す
+            shutil.move(pending_path, file_path)
+            continue
+        lines.append(json.dumps(request, ensure_ascii=False))
+        files[custom_id] = file_path
+        cache_keys[custom_id] = key
+
+    if not lines:
+        logging.info("バッチで処理するファイルはありません")
+        os.rmdir(pending_folder)
+        return None
+
+    input_path = os.path.join(batch_folder, f"batch_{stamp}.jsonl")
+    write_atomic(input_path, "\n".join(lines) + "\n")
+    # 送信前に状態ファイルを保存しておく（バッチIDは作成後に追記する）
+    state_path = os.path.join(batch_folder, f"batch_{stamp}.json")
+    state = {
+        "batch_id": None,
+        "input_file": input_path,
+        "submitted_at": datetime.now().isoformat(timespec="seconds"),
+        "pending_folder": pending_folder,
+        "files": sorted(files),
+        "cache_keys": cache_keys
+    }
+    write_state(state_path, state)
+    client = get_api_client(config)
+    try:
+        with open(input_path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+    except Exception:
+        return_files(state_path, state, watch_folder)
+        raise
+    state["batch_id"] = batch.id
+    write_state(state_path, state)
+    logging.info(f"バッチを送信しました: {batch.id}（{len(files)}件）")
+    return state_path
+
+
+def return_files(state_path, state, watch_folder):
+    """送信できなかったバッチのファイルを監視フォルダへ戻し、状態ファイルを片付ける"""
+    for custom_id in state["files"]:
+        pending_path = os.path.join(state["pending_folder"], custom_id)
+        if os.path.exists(pending_path):
+            shutil.move(pending_path, os.path.join(watch_folder, custom_id))
+    if not os.listdir(state["pending_folder"]):
+        os.rmdir(state["pending_folder"])
+    os.replace(state_path, state_path + ".failed")
+
+
+def wait_for_batch(client, batch_id, poll_interval):
+    """バッチが終了状態になるまで待機"""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        progress = f"（{counts.completed + counts.failed}/{counts.total}件）" if counts else ""
+        logging.info(f"バッチ状態: {batch.id} {batch.status}{progress}")
+        if batch.status in FINAL_STATUSES:
+            return batch
+        time.sleep(poll_interval)
+
+
+def read_results(client, file_id):
+    """バッチ結果ファイルを custom_id → 結果行 の辞書にする"""
+    if not file_id:
+        return {}
+    content = client.files.content(file_id).text
+    results = {}
+    for line in content.splitlines():
+        if line.strip():
+            item = json.loads(line)
+            results[item["custom_id"]] = item
+    return results
+
+
+def collect_batch(state_path, config):
+    """完了したバッチの結果を議事録として保存し、元ファイルをアーカイブ（失敗分は input/ に戻す）"""
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    watch_folder = resolve_path(config["watch_folder"])
+    if not state.get("batch_id"):
+        # バッチの作成前に止まった（送信されていない）
+        logging.warning(f"送信されていないバッチのファイルを監視フォルダへ戻します: {state_path}")
+        return_files(state_path, state, watch_folder)
+        return 0
+    client = get_api_client(config)
+    batch = wait_for_batch(client, state["batch_id"], config.get("batch_poll_interval", 60))
+
+    results = read_results(client, batch.output_file_id)
+    results.update(read_results(client, batch.error_file_id))
+    cache = get_result_cache(config)
+
+    succeeded = 0
+    for custom_id in state["files"]:
+        pending_path = os.path.join(state["pending_folder"], custom_id)
+        if not os.path.exists(pending_path):
+            continue  # 回収済み
+        item = results.get(custom_id) or {}
+        response = item.get("response") or {}
+        if response.get("status_code") == 200:
+            minutes = response["body"]["choices"][0]["message"]["content"]
+            if cache:
+                cache.put(state["cache_keys"][custom_id], minutes)
+            if save_minutes(custom_id, pending_path, minutes, config):
+                succeeded += 1
+        else:
+            error = item.get("error") or response.get("body") or f"バッチ状態: {batch.status}"
+            logging.error(f"バッチでの生成に失敗: {custom_id} - {error}")
+            record_error(f"議事録生成に失敗: {custom_id}")
+            shutil.move(pending_path, os.path.join(watch_folder, custom_id))
+
+    logging.info(f"バッチを回収しました: {batch.id}（成功 {succeeded}/{len(state['files'])}件）")
+    if not os.listdir(state["pending_folder"]):
+        os.rmdir(state["pending_folder"])
+        os.replace(state_path, state_path + ".done")
+    return succeeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch APIで文字起こしをまとめて処理")
+    parser.add_argument("--no-wait", action="store_true", help="送信だけ行い結果を待たない")
+    parser.add_argument("--resume", action="store_true", help="送信済みのバッチの結果を回収する")
+    args = parser.parse_args()
+
+    config = load_config()
+    # auto_processor と同時に動かしても状態ファイル・ログを共有しないよう、ログは別のファイルに書く
+    setup_logging(config, "batch_processor.log")
+    batch_folder = resolve_path(config.get("batch_folder", "batch"))
+    if args.resume:
+        state_paths = sorted(glob.glob(os.path.join(batch_folder, "batch_*.json")))
+    else:
+        state_path = submit_batch(config)
+        state_paths = [state_path] if state_path and not args.no_wait else []
+    for state_path in state_paths:
+        collect_batch(state_path, config)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
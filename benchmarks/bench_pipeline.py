@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""パイプライン全体のベンチマーク（APIキー・課金不要）
+
+ローカルのモックサーバー（mock_openai_server.py）を起動し、サイズ・文字コードの異なる
+文字起こしを一時フォルダに用意して auto_processor.check_and_process で処理する。
+1分あたりの処理件数、段階ごとの所要時間（p50/p95）、ファイルごとのターンアラウンド時間
+（開始から議事録ができるまで）、メモリ使用量のピークを表示する。
+段階ごとの所要時間は auto_processor が記録する metrics.jsonl から集計する。
+
+使い方:
+  python benchmarks/bench_pipeline.py
+  python benchmarks/bench_pipeline.py --files 5 --concurrency 8 --latency 0.5 --token-rate 100
+  python benchmarks/bench_pipeline.py --rate-limit-rate 0.1 --error-rate 0.05 --json result.json
+  python benchmarks/bench_pipeline.py --schedule none --token-rate 2000   # 処理順による待ち時間の違い
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mock_openai_server import MockState, create_server  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LINES = [
+    "山田：では次の議題、来期の予算配分について確認します。えー、資料の3ページをご覧ください。",
+    "佐藤：はい。営業部からは広告費を前年比で一割増やしたいという要望が出ています。",
+    "鈴木：その件は先月の会議でも話しましたが、効果測定の方法を先に決めるべきだと思います。",
+    "山田：わかりました。では効果測定の案を鈴木さんに来週までにまとめていただけますか。",
+    "鈴木：承知しました。金曜日までに共有します。",
+]
+
+# 集計する段階（metrics.jsonl の段階名 → 表示名）
+STAGES = {
+    "reading": "読み込み",
+    "generating": "生成",
+    "writing": "保存",
+    "archiving": "移動",
+    "total": "合計",
+    "ttft": "TTFT",
+}
+
+
+def make_corpus(folder, sizes, encodings, files):
+    """サイズ（文字数）・文字コードの組み合わせごとに files 件の文字起こしを作る"""
+    paths = []
+    for size in sizes:
+        for encoding in encodings:
+            for index in range(files):
+                # 内容が重複しないよう（キャッシュに当たらないよう）番号を入れる
+                lines = [f"（{size}-{encoding}-{index}）"]
+                length = 0
+                while length < size:
+                    line = LINES[len(lines) % len(LINES)]
+                    lines.append(line)
+                    length += len(line) + 1
+                path = os.path.join(folder, f"bench_{size}_{encoding.replace('-', '')}_{index:03d}.txt")
+                with open(path, "w", encoding=encoding) as f:
+                    f.write("\n".join(lines) + "\n")
+                paths.append(path)
+    return paths
+
+
+def percentile(values, p):
+    """最近傍法のパーセンタイル"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def load_timings(metrics_path):
+    """metrics.jsonl から段階ごとの所要時間・推定コスト・前処理で削減したトークン数を集計"""
+    timings = {name: [] for name in STAGES}
+    cost = 0.0
+    saved_tokens = 0
+    with open(metrics_path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            for stage, seconds in entry["stages"].items():
+                timings.setdefault(stage, []).append(seconds)
+            timings["total"].append(entry["total_seconds"])
+            if entry["ttft_seconds"] is not None:
+                timings["ttft"].append(entry["ttft_seconds"])
+            cost += entry["cost_usd"]
+            saved_tokens += entry.get("preprocess_saved_tokens") or 0
+    return timings, cost, saved_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="パイプライン全体のベンチマーク（モックサーバー使用）")
+    parser.add_argument("--sizes", default="2000,20000,100000", help="文字起こしの文字数（カンマ区切り）")
+    parser.add_argument("--encodings", default="utf-8,shift_jis,euc_jp", help="文字コード（カンマ区切り）")
+    parser.add_argument("--files", type=int, default=3, help="サイズ・文字コードの組み合わせごとのファイル数")
+    parser.add_argument("--concurrency", type=int, default=3, help="max_concurrency")
+    parser.add_argument("--schedule", default="shortest", choices=["shortest", "fifo", "none"], help="schedule_policy")
+    parser.add_argument("--no-stream", action="store_true", help="ストリーミングを使わない")
+    parser.add_argument("--cache", action="store_true", help="議事録キャッシュを有効にする")
+    parser.add_argument("--no-preprocess", action="store_true", help="文字起こしの前処理を行わない")
+    parser.add_argument("--rpm", type=int, default=100000, help="レート制限（1分あたりのリクエスト数）")
+    parser.add_argument("--tpm", type=int, default=100000000, help="レート制限（1分あたりのトークン数）")
+    parser.add_argument("--latency", type=float, default=0.2, help="モック: 最初のトークンまでの秒数")
+    parser.add_argument("--token-rate", type=float, default=0, help="モック: 1秒あたりの出力トークン数（0は待ち時間なし）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="モック: 500エラーを返す確率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="モック: 429を返す確率")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="モック: 429応答の retry-after 秒数")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Pythonヒープのピークも測る（メモリ確保が多い処理が数倍遅くなるため所要時間の比較には使わない）")
+    parser.add_argument("--json", help="結果をJSONで保存するパス")
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    state = MockState(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+    server = create_server("127.0.0.1", 0, state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    workspace = tempfile.mkdtemp(prefix="aimatome-bench-")
+    config = {
+        "watch_folder": os.path.join(workspace, "input"),
+        "output_folder": os.path.join(workspace, "output"),
+        "processed_folder": os.path.join(workspace, "archive"),
+        "check_interval": 30,
+        "max_concurrency": args.concurrency,
+        "schedule_policy": args.schedule,
+        "model": "gpt-4-turbo",
+        "max_tokens": 4096,
+        "temperature": 0.3,
+        "stream": not args.no_stream,
+        "cache_enabled": args.cache,
+        "cache_folder": os.path.join(workspace, "cache"),
+        "preprocess_enabled": not args.no_preprocess,
+        "rate_limits": {"default": {"rpm": args.rpm, "tpm": args.tpm}},
+        "max_retries": 6,
+        "retry_base_delay": 0.2,
+        "retry_max_delay": 5,
+        "ledger_path": os.path.join(workspace, "jobs.db"),
+        "metrics_path": os.path.join(workspace, "metrics.jsonl"),
+        "prometheus_path": os.path.join(workspace, "metrics.prom"),
+        "lease_enabled": True,
+        "log_max_mb": 50,
+    }
+    os.makedirs(config["watch_folder"])
+    with open(os.path.join(workspace, "auto_config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+
+    # auto_processor は作業フォルダの auto_config.json を読み、ログもそこへ書く
+    os.chdir(workspace)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-bench"
+    import auto_processor
+    auto_processor.setup_logging(auto_processor.load_config())
+    auto_processor.STATUS_FOLDER = workspace
+    auto_processor.publish_status = True  # 状態ファイルの書き出しも含めて測る
+    for handler in auto_processor.logging.getLogger().handlers:
+        if isinstance(handler, auto_processor.logging.StreamHandler) and handler.stream in (sys.stdout, sys.stderr):
+            handler.setLevel(auto_processor.logging.WARNING)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    encodings = args.encodings.split(",")
+    # glob と同じくファイル名順に渡す（大きいファイルが先頭に来る）
+    paths = sorted(make_corpus(config["watch_folder"], sizes, encodings, args.files))
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    started_at = time.time()
+    started = time.perf_counter()
+    auto_processor.check_and_process(paths)
+    elapsed = time.perf_counter() - started
+    # 議事録の更新時刻から、開始から各ファイルの議事録ができるまでの時間を求める
+    output_folder = config["output_folder"]
+    turnaround = [
+        max(0.0, os.path.getmtime(os.path.join(output_folder, name)) - started_at)
+        for name in os.listdir(output_folder)
+    ] if os.path.isdir(output_folder) else []
+    peak_traced = None
+    if args.tracemalloc:
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    for leases in auto_processor.lease_managers.values():
+        leases.close()
+    server.shutdown()
+
+    timings, cost, saved_tokens = load_timings(config["metrics_path"])
+    archived = len(os.listdir(config["processed_folder"])) if os.path.isdir(config["processed_folder"]) else 0
+    result = {
+        "files": len(paths),
+        "archived": archived,
+        "failed": len(paths) - archived,
+        "input_mb": round(total_bytes / 1024 / 1024, 2),
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_minute": round(archived / elapsed * 60, 1) if elapsed else None,
+        "stages": {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95)
+            }
+            for name, values in timings.items()
+        },
+        "turnaround_seconds": {
+            "mean": round(sum(turnaround) / len(turnaround), 3) if turnaround else None,
+            "p95": round(percentile(turnaround, 95), 3) if turnaround else None,
+        },
+        "cost_usd": round(cost, 4),
+        "preprocess_saved_tokens": saved_tokens,
+        "peak_traced_mb": round(peak_traced / 1024 / 1024, 1) if peak_traced is not None else None,
+        "max_rss_mb": None,
+        "mock": dict(state.counts),
+        "workspace": workspace,
+    }
+    if resource is not None:
+        # Linuxは KB 単位、macOSはバイト単位
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["max_rss_mb"] = round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    print(f"ファイル: {result['files']}件（{result['input_mb']}MB） / 同時処理数: {args.concurrency} / 処理順: {args.schedule}")
+    print(f"完了: {archived}件 / 失敗: {result['failed']}件 / 所要時間: {elapsed:.1f}秒")
+    print(f"スループット: {result['files_per_minute']} ファイル/分")
+    print(f"{'段階':<8} {'件数':>6} {'p50':>10} {'p95':>10}")
+    for name, label in STAGES.items():
+        stage = result["stages"][name]
+        if not stage["count"]:
+            continue
+        print(f"{label:<8} {stage['count']:>6} {stage['p50'] * 1000:>8.1f}ms {stage['p95'] * 1000:>8.1f}ms")
+    if turnaround:
+        print(f"ターンアラウンド: 平均 {result['turnaround_seconds']['mean']:.2f}秒 / p95 {result['turnaround_seconds']['p95']:.2f}秒")
+    print(f"推定コスト（実APIの場合）: ${result['cost_usd']:.4f} / 前処理で削減: {saved_tokens}トークン")
+    print(f"メモリ: 最大RSS {result['max_rss_mb'] or '--'}MB / Pythonヒープのピーク {result['peak_traced_mb'] or '--'}MB")
+    print(f"モックへのリクエスト: {state.counts['requests']}件（429: {state.counts['rate_limited']}件, 500: {state.counts['errors']}件）")
+    print(f"作業フォルダ: {workspace}")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    return 0 if result["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
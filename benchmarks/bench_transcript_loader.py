@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""文字起こし読み込みのマイクロベンチマーク
+
+従来の「文字コードごとに開き直して全体を読む」方式と transcript_loader.load_transcript を
+大きなファイルで比較する。
+
+使い方:
+  python benchmarks/bench_transcript_loader.py --size-mb 10 --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_loader import load_transcript  # noqa: E402
+
+LINE = "山田：では次の議題、来期の予算配分について確認します。えー、資料の3ページをご覧ください。\n"
+
+
+def legacy_read(path):
+    """変更前の auto_processor.process_file と同じ読み込み方"""
+    for encoding in ['utf-8', 'shift_jis', 'cp932', 'euc_jp']:
+        try:
+            with open(path, "r", encoding=encoding) as f:
+                return f.read(), encoding
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+
+def make_file(folder, encoding, size_mb):
+    line = LINE.encode(encoding)
+    path = os.path.join(folder, f"transcript_{encoding}.txt")
+    with open(path, "wb") as f:
+        f.write(line * max(1, int(size_mb * 1024 * 1024 / len(line))))
+    return path
+
+
+def measure(func, path, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text, encoding = func(path)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), encoding, len(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こし読み込みのベンチマーク")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"ファイルサイズ: 約{args.size_mb}MB / 各{args.repeat}回の中央値")
+    print(f"{'文字コード':<10} {'従来方式':>10} {'新方式':>10} {'高速化':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for encoding in ("utf-8", "shift_jis", "euc_jp"):
+            path = make_file(folder, encoding, args.size_mb)
+            legacy_time, legacy_encoding, legacy_length = measure(legacy_read, path, args.repeat)
+            new_time, new_encoding, new_length = measure(load_transcript, path, args.repeat)
+            if legacy_length != new_length:
+                print(f"  警告: {encoding} のデコード結果が一致しません（{legacy_encoding} / {new_encoding}）")
+            print(f"{encoding:<10} {legacy_time * 1000:>8.1f}ms {new_time * 1000:>8.1f}ms {legacy_time / new_time:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""複数のプロセス・ホストで同じ監視フォルダを共有するためのファイルリース
+
+ワーカーはファイルを processing/<ワーカーID>/ へリネームして確保する。リネームは
+同じファイルシステム上では原子的なので、同じファイルを確保できるのは1ワーカーだけになる。
+各ワーカーは自分のフォルダの .lease ファイルを定期的に更新し、更新が lease_ttl 秒
+途絶えたワーカー（停止したワーカー）のファイルは他のワーカーが監視フォルダへ戻す。
+ワーカーIDは既定でホスト名のため、強制終了したワーカーを再起動した場合は、起動時に
+自分のフォルダに残っているファイルを監視フォルダへ戻す。ただし同じIDのリースがまだ
+更新されている（同じPCで別のプロセスが動いている）場合は、そのファイルには触れず
+「ID-プロセスID」を自分のIDにする。
+サブフォルダ（優先処理用の urgent など）から確保したファイルは確保元を記録しておき、
+戻すときは元のサブフォルダへ戻す。
+"""
+import os
+import time
+import socket
+import logging
+import threading
+
+LEASE_FILE = ".lease"
+# 確保元のサブフォルダ（監視フォルダからの相対パス）を記録するファイル: .<ファイル名>.source
+SOURCE_SUFFIX = ".source"
+
+
+def _source_path(claimed_path):
+    folder, name = os.path.split(claimed_path)
+    return os.path.join(folder, f".{name}{SOURCE_SUFFIX}")
+
+
+def default_worker_id():
+    """ホスト名からワーカーIDを作る（再起動しても同じIDになる）"""
+    return socket.gethostname()
+
+
+class LeaseManager:
+    """ファイルの確保・解放と、停止したワーカーのリース回収を行う"""
+
+    def __init__(self, watch_folder, processing_folder, worker_id=None, lease_ttl=300):
+        self.watch_folder = watch_folder
+        self.processing_folder = processing_folder
+        self.lease_ttl = lease_ttl
+        self._set_worker_id(worker_id or default_worker_id())
+        if self._lease_is_live():
+            # 同じIDの別のワーカーが動作中（確保中のファイルを奪わないよう別のIDにする）
+            logging.warning(f"ワーカーID {self.worker_id} は動作中の別のプロセスが使っているため、"
+                            f"{self.worker_id}-{os.getpid()} を使います")
+            self._set_worker_id(f"{self.worker_id}-{os.getpid()}")
+        self._stop = threading.Event()
+        self._claim_lock = threading.Lock()  # 自分のフォルダへの確保はこのプロセスのスレッドだけが行う
+        os.makedirs(self.worker_folder, exist_ok=True)
+        self.heartbeat()
+        self._release_leftovers()
+        self._thread = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _set_worker_id(self, worker_id):
+        self.worker_id = worker_id
+        self.worker_folder = os.path.join(self.processing_folder, worker_id)
+        self.lease_path = os.path.join(self.worker_folder, LEASE_FILE)
+
+    def _lease_is_live(self):
+        """このIDのリースが lease_ttl 秒以内に更新されているか"""
+        try:
+            return time.time() - os.stat(self.lease_path).st_mtime < self.lease_ttl
+        except OSError:
+            return False
+
+    def heartbeat(self):
+        """リースを更新して、このワーカーが動作中であることを示す"""
+        try:
+            with open(self.lease_path, "w", encoding="utf-8") as f:
+                f.write(f"{self.worker_id} {time.time():.0f}\n")
+        except OSError as e:
+            logging.warning(f"リースの更新に失敗: {e}")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(max(1, self.lease_ttl / 3)):
+            self.heartbeat()
+            # 監視フォルダにファイルが届かなくても、停止したワーカーのファイルを戻す
+            try:
+                self.recover_expired()
+            except Exception as e:
+                logging.warning(f"リースの回収エラー: {e}")
+
+    def _release_leftovers(self):
+        """前回強制終了したときに確保したままのファイルを戻す（リースが切れている場合のみ呼ばれる）"""
+        names = [name for name in os.listdir(self.worker_folder) if not name.startswith(".")]
+        if names:
+            logging.warning(f"前回の停止時に確保したままのファイルを戻します: {len(names)}件")
+        for name in names:
+            self.release(os.path.join(self.worker_folder, name))
+
+    def claim(self, file_path):
+        """ファイルを確保して確保後のパスを返す（他のワーカーが先に確保した場合などはNone）"""
+        claimed_path = os.path.join(self.worker_folder, os.path.basename(file_path))
+        with self._claim_lock:
+            # input/a.txt と input/urgent/a.txt のような同じ名前のファイルを上書きしない
+            # （POSIXのリネームは確保先に同じ名前があっても黙って置き換える）
+            if os.path.lexists(claimed_path):
+                logging.info(f"同じ名前のファイルを処理中のため次回のチェックで処理します: {file_path}")
+                return None
+            try:
+                os.rename(file_path, claimed_path)
+            except FileNotFoundError:
+                return None  # 他のワーカーが先に確保した
+            except OSError as e:
+                # Windowsでは書き込み中のファイルはリネームできない
+                logging.info(f"ファイルを確保できません: {file_path} - {e}")
+                return None
+            source = os.path.relpath(os.path.dirname(os.path.abspath(file_path)), self.watch_folder)
+            if source != "." and not source.startswith(".."):
+                try:
+                    with open(_source_path(claimed_path), "w", encoding="utf-8") as f:
+                        f.write(source)
+                except OSError as e:
+                    logging.warning(f"確保元を記録できません: {file_path} - {e}")
+        return claimed_path
+
+    def _source_folder(self, claimed_path):
+        """確保元のフォルダ（記録が無ければ監視フォルダ）を返し、記録を削除する"""
+        source_path = _source_path(claimed_path)
+        try:
+            with open(source_path, "r", encoding="utf-8") as f:
+                source = f.read().strip()
+            os.remove(source_path)
+        except OSError:
+            return self.watch_folder
+        folder = os.path.join(self.watch_folder, source)
+        return folder if os.path.isdir(folder) else self.watch_folder
+
+    def release(self, claimed_path, folder=None):
+        """処理しきれなかったファイルを確保元のフォルダ（folder を指定した場合はそのフォルダ）へ戻し、戻した先のパスを返す"""
+        source_folder = self._source_folder(claimed_path)
+        if not os.path.exists(claimed_path):
+            return None
+        target = os.path.join(folder or source_folder, os.path.basename(claimed_path))
+        try:
+            os.rename(claimed_path, target)
+        except OSError as e:
+            logging.error(f"ファイルを監視フォルダへ戻せません: {claimed_path} - {e}")
+            return None
+        return target
+
+    def recover_expired(self):
+        """リースが期限切れになったワーカーのファイルを監視フォルダへ戻す"""
+        try:
+            entries = list(os.scandir(self.processing_folder))
+        except OSError:
+            return 0
+        recovered = 0
+        now = time.time()
+        for entry in entries:
+            if entry.name == self.worker_id or entry.name.startswith(".") or not entry.is_dir():
+                continue
+            try:
+                heartbeat = os.stat(os.path.join(entry.path, LEASE_FILE)).st_mtime
+            except OSError:
+                try:
+                    heartbeat = entry.stat().st_mtime
+                except OSError:
+                    continue
+            if now - heartbeat < self.lease_ttl:
+                continue
+            # フォルダごとリネームして、回収するワーカーを1つに限定する
+            reclaim_folder = os.path.join(self.processing_folder, f".reclaim-{self.worker_id}-{entry.name}")
+            try:
+                os.rename(entry.path, reclaim_folder)
+            except OSError:
+                continue
+            logging.warning(f"停止したワーカーのリースを回収します: {entry.name}")
+            names = os.listdir(reclaim_folder)
+            for name in names:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(reclaim_folder, name)
+                try:
+                    os.rename(path, os.path.join(self._source_folder(path), name))
+                    recovered += 1
+                except OSError as e:
+                    logging.error(f"ファイルを監視フォルダへ戻せません: {path} - {e}")
+            # リースと、処理済みのファイルの確保元の記録を削除
+            for name in names:
+                if name.startswith("."):
+                    try:
+                        os.remove(os.path.join(reclaim_folder, name))
+                    except OSError:
+                        pass
+            try:
+                os.rmdir(reclaim_folder)
+            except OSError:
+                pass
+        return recovered
+
+    def close(self):
+        """確保中のファイルを戻してリースを削除"""
+        self._stop.set()
+        for name in os.listdir(self.worker_folder):
+            if not name.startswith("."):
+                self.release(os.path.join(self.worker_folder, name))
+        try:
+            os.remove(self.lease_path)
+            os.rmdir(self.worker_folder)
+        except OSError:
+            pass
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""処理待ちファイルの処理順の決定
+
+優先度の高いファイル（優先処理用のサブフォルダ・ファイル名の接頭辞で指定）から順に、
+同じ優先度の中では policy に従って並べる。
+
+- shortest: 小さい（短い）ファイルから処理する。長い会議1件の後ろで短い会議が待たされず、
+  全体の平均の待ち時間が短くなる
+- fifo: 更新時刻の古い順に処理する
+- none: 並べ替えない
+
+shortest では大きいファイルが後回しにされ続けないよう、max_wait_minutes 分以上待っている
+ファイルは大きさに関係なく先に処理する（待ち時間はこのプロセスが最初に見つけた時刻から数える）。
+"""
+import os
+import glob
+import time
+import logging
+import threading
+from transcript_chunker import count_tokens
+from transcript_loader import load_transcript
+
+POLICIES = ("shortest", "fifo", "none")
+
+
+def pending_files(watch_folder, priority_folders=()):
+    """監視フォルダと優先処理用のサブフォルダにある処理待ちの .txt ファイル"""
+    paths = glob.glob(os.path.join(watch_folder, "*.txt"))
+    for name in priority_folders:
+        paths += glob.glob(os.path.join(watch_folder, name, "*.txt"))
+    return paths
+
+
+class FileScheduler:
+    """処理待ちファイルを優先度・ポリシー・待ち時間に応じて並べる"""
+
+    def __init__(self, watch_folder, policy="shortest", size_metric="bytes", priority_folders=(),
+                 priority_prefixes=(), max_wait_minutes=60, model="gpt-4-turbo"):
+        if policy not in POLICIES:
+            logging.warning(f"schedule_policy の値が不正なため shortest を使います: {policy}")
+            policy = "shortest"
+        self.watch_folder = os.path.abspath(watch_folder)
+        self.policy = policy
+        self.size_metric = size_metric
+        self.priority_folders = {os.path.join(self.watch_folder, name) for name in priority_folders}
+        self.priority_prefixes = tuple(priority_prefixes)
+        self.max_wait_seconds = max_wait_minutes * 60
+        self.model = model
+        self._lock = threading.Lock()
+        self._first_seen = {}  # パス → 最初に見つけた時刻
+        self._sizes = {}  # パス → ((バイト数, 更新時刻), トークン数)
+
+    def is_priority(self, path):
+        """優先処理用のサブフォルダにあるか、ファイル名が優先の接頭辞で始まるか"""
+        if os.path.dirname(os.path.abspath(path)) in self.priority_folders:
+            return True
+        return bool(self.priority_prefixes) and os.path.basename(path).startswith(self.priority_prefixes)
+
+    def _size(self, path):
+        """ファイルの大きさ（size_metric が tokens なら文字起こしのトークン数、読めなければバイト数）
+
+        トークン数はファイルが変わるまで記録しておき、並べ直すたびに読み直さない。
+        """
+        try:
+            stat = os.stat(path)
+            if self.size_metric == "tokens":
+                signature = (stat.st_size, stat.st_mtime_ns)
+                with self._lock:
+                    cached = self._sizes.get(path)
+                if cached is not None and cached[0] == signature:
+                    return cached[1]
+                try:
+                    transcript, _ = load_transcript(path)
+                    tokens = count_tokens(transcript, self.model)
+                except (UnicodeDecodeError, ValueError):
+                    return stat.st_size
+                with self._lock:
+                    self._sizes[path] = (signature, tokens)
+                return tokens
+            return stat.st_size
+        except OSError:
+            return 0
+
+    def order(self, paths):
+        """処理する順に並べたパスのリストを返す"""
+        now = time.monotonic()
+        current = set(paths)
+        with self._lock:
+            for path in paths:
+                self._first_seen.setdefault(path, now)
+            # 無くなったファイル（処理済み）の記録を破棄
+            for path in [path for path in self._first_seen if path not in current and not os.path.exists(path)]:
+                del self._first_seen[path]
+            for path in [path for path in self._sizes if path not in self._first_seen]:
+                del self._sizes[path]
+            waited = {path: now - self._first_seen[path] for path in paths}
+        if self.policy == "none":
+            return sorted(paths, key=lambda path: not self.is_priority(path))
+
+        def mtime(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0
+
+        if self.policy == "fifo":
+            keys = {path: mtime(path) for path in paths}
+        else:
+            keys = {path: self._size(path) for path in paths}
+        starving = {
+            path for path in paths
+            if self.policy == "shortest" and self.max_wait_seconds and waited[path] >= self.max_wait_seconds
+            and not self.is_priority(path)
+        }
+        for path in sorted(starving):
+            logging.info(f"{waited[path] / 60:.0f}分待っているため先に処理します: {os.path.basename(path)}")
+        # 優先 → 待ち時間の上限を超えたもの（古い順） → ポリシーの順
+        ordered = sorted(paths, key=lambda path: (
+            not self.is_priority(path),
+            path not in starving,
+            -waited[path] if path in starving else keys[path],
+            os.path.basename(path)
+        ))
+        if len(ordered) > 1:
+            logging.info(f"処理順（{self.policy}）: " + ", ".join(os.path.basename(path) for path in ordered))
+        return ordered
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""監視フォルダの変更を検知し、書き込みが完了したファイルを通知する"""
+import os
+import sys
+import time
+import select
+import threading
+import ctypes
+import ctypes.util
+import logging
+
+# inotifyのイベントマスク（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+# 消えたファイル（確保・アーカイブされたもの）もすぐに検知し、置き直された場合に再通知できるようにする
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def _open_inotify(folders):
+    """inotifyで監視を開始（Linux以外や失敗時はNone）"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        for folder in folders:
+            if libc.inotify_add_watch(fd, os.fsencode(folder), WATCH_MASK) < 0:
+                os.close(fd)
+                return None
+        return fd
+    except (OSError, AttributeError) as e:
+        logging.warning(f"inotifyを利用できません: {e}")
+        return None
+
+
+class FolderWatcher:
+    """フォルダ内の.txtファイルを監視し、サイズと更新時刻が一定時間変化しなくなったものを返す
+
+    growing_settle_seconds を指定すると、追記されている（見つけた後にサイズが増えた）ファイルは
+    発言の途切れで完了と判定しないよう growing_settle_seconds 秒変化が無くなるまで待つ。
+    growing_after 秒以上変化し続けているファイルは会議中の文字起こしとして growing() で返す。
+    subfolders に指定したサブフォルダ（優先処理用の urgent など）も合わせて監視する。
+    """
+
+    def __init__(self, folder, settle_seconds=5, poll_interval=2, suffix=".txt",
+                 growing_after=None, growing_settle_seconds=None, subfolders=()):
+        self.folder = folder
+        self.folders = [folder] + [os.path.join(folder, name) for name in subfolders]
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.suffix = suffix
+        self.growing_after = growing_after
+        self.growing_settle_seconds = growing_settle_seconds
+        self._files = {}  # パス → (サイズ, 更新時刻, 最後に変化を確認した時刻)
+        self._changing_since = {}  # 書き込み完了待ちのパス → 変化し始めた時刻
+        self._appended = set()  # 書き込み完了待ちのうち、見つけた後に追記されたパス
+        self._notified = {}  # 通知済みのパス → 通知時の (サイズ, 更新時刻)
+        self._released = {}  # 処理に失敗して戻されたパス → 戻した時の (サイズ, 更新時刻)
+        self._released_lock = threading.Lock()
+        self._fd = _open_inotify(self.folders)
+        if self._fd is not None:
+            logging.info(f"inotifyでフォルダを監視します: {folder}")
+        else:
+            logging.info(f"{poll_interval}秒間隔のスキャンでフォルダを監視します: {folder}")
+
+    @property
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def scan(self):
+        """フォルダをスキャンし、書き込みが完了した未通知ファイルのパスを返す"""
+        now = time.monotonic()
+        seen = set()
+        ready = []
+        entries = []
+        for folder in self.folders:
+            try:
+                entries += list(os.scandir(folder))
+            except OSError as e:
+                if folder != self.folder and isinstance(e, FileNotFoundError):
+                    continue  # 優先処理用のサブフォルダは無くてもよい
+                logging.warning(f"監視フォルダをスキャンできません: {folder} - {e}")
+                return ready
+        for entry in entries:
+            if not entry.name.endswith(self.suffix) or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # スキャン中に削除された
+            path = entry.path
+            seen.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self._files.get(path)
+            if previous is None or previous[:2] != signature:
+                # 新規または変化あり → 安定判定をやり直す
+                if previous is not None and 0 < previous[0] < stat.st_size:
+                    self._appended.add(path)
+                self._files[path] = signature + (now,)
+                self._changing_since.setdefault(path, now)
+                continue
+            if self._notified.get(path) != signature and now - previous[2] >= self._settle_seconds_for(path):
+                self._notified[path] = signature
+                self._changing_since.pop(path, None)
+                self._appended.discard(path)
+                ready.append(path)
+        # 消えたファイルの情報を破棄（同じ内容で置き直されたファイルも新しいファイルとして通知する）
+        for path in set(self._files) - seen:
+            del self._files[path]
+            self._changing_since.pop(path, None)
+            self._appended.discard(path)
+            self._notified.pop(path, None)
+        # 処理に失敗して戻されたファイルは、内容が変わるか定期チェックまで再通知しない
+        with self._released_lock:
+            self._notified.update(self._released)
+            self._released.clear()
+        return sorted(ready)
+
+    def mark_released(self, path):
+        """処理に失敗して監視フォルダへ戻したファイルを記録（ワーカーのスレッドから呼ぶ）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        with self._released_lock:
+            self._released[path] = (stat.st_size, stat.st_mtime_ns)
+
+    def _is_growing(self, path):
+        if self.growing_after is None or path not in self._changing_since:
+            return False
+        return self._files[path][2] - self._changing_since[path] >= self.growing_after
+
+    def _settle_seconds_for(self, path):
+        if self.growing_settle_seconds is not None and (path in self._appended or self._is_growing(path)):
+            return self.growing_settle_seconds
+        return self.settle_seconds
+
+    def growing(self):
+        """追記され続けている（書き込み完了待ちの）ファイルのパスを返す"""
+        return sorted(
+            path for path, info in self._files.items()
+            if self._notified.get(path) != info[:2] and self._is_growing(path)
+        )
+
+    def has_pending(self):
+        """書き込み完了待ちのファイルがあるか"""
+        return any(self._notified.get(path) != info[:2] for path, info in self._files.items())
+
+    def reset(self):
+        """通知済みの記録を消去し、残っているファイルを再度通知対象にする"""
+        self._notified.clear()
+
+    def wait(self, timeout):
+        """変更イベントまたはタイムアウトまで待機"""
+        if self._fd is None:
+            time.sleep(min(timeout, self.poll_interval))
+            return
+        if self.has_pending():
+            # 書き込み完了を判定するため、イベントが無くても定期的に再確認する
+            timeout = min(timeout, max(0.5, self.settle_seconds / 2))
+        readable, _, _ = select.select([self._fd], [], [], max(0, timeout))
+        if readable:
+            self._drain()
+
+    def _drain(self):
+        """溜まったinotifyイベントを読み捨てる（変更の有無だけを利用する）"""
+        while True:
+            try:
+                if not os.read(self._fd, 65536):
+                    return
+            except BlockingIOError:
+                return
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""ファイルごとの処理状況をSQLiteに記録するジョブ台帳
+
+状態は queued → in_flight → generated → written → archived と進み、失敗時は failed になる。
+生成済み（generated / written）の議事録は台帳にも保存しておき、再起動後に同じファイルを
+処理する際はAPIを呼ばずにそこから再開する。
+"""
+import sqlite3
+import threading
+from datetime import datetime
+
+STATES = ("queued", "in_flight", "generated", "written", "archived", "failed")
+# 議事録の生成が済んでいて、API呼び出しなしで再開できる状態
+RESUMABLE_STATES = ("generated", "written")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL,
+    content_key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    bytes INTEGER,
+    output_path TEXT,
+    minutes TEXT,
+    prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    error TEXT,
+    queued_at TEXT,
+    in_flight_at TEXT,
+    generated_at TEXT,
+    written_at TEXT,
+    archived_at TEXT,
+    failed_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_file_key ON jobs (file_name, content_key);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+"""
+
+
+class JobLedger:
+    """スレッド間で共有できるジョブ台帳"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def _now(self):
+        return datetime.now().isoformat(timespec="seconds")
+
+    def start(self, file_name, content_key, size=None):
+        """ジョブを開始し (ジョブID, 状態, 保存済みの議事録) を返す
+
+        同じファイル名・内容で生成済みのジョブが残っていればそれを再開する。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, state, minutes FROM jobs WHERE file_name = ? AND content_key = ? "
+                "AND state IN (?, ?) ORDER BY id DESC LIMIT 1",
+                (file_name, content_key) + RESUMABLE_STATES
+            ).fetchone()
+            if row is not None:
+                return row["id"], row["state"], row["minutes"]
+            # 途中で止まった（in_flight / queued のまま）古いジョブは失敗扱いにして作り直す
+            now = self._now()
+            self._conn.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, failed_at = ?, updated_at = ? "
+                "WHERE file_name = ? AND content_key = ? AND state IN ('queued', 'in_flight')",
+                ("中断されたジョブ", now, now, file_name, content_key)
+            )
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (file_name, content_key, state, bytes, queued_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (file_name, content_key, size, now, now)
+            )
+            return cursor.lastrowid, "queued", None
+
+    def mark(self, job_id, state, **fields):
+        """ジョブの状態を更新（<state>_at に時刻を記録し、fields の列も更新）"""
+        if state not in STATES:
+            raise ValueError(f"不明な状態: {state}")
+        now = self._now()
+        columns = {"state": state, f"{state}_at": now, "updated_at": now}
+        columns.update(fields)
+        if state == "archived":
+            columns["minutes"] = None  # 処理が完了したら保存していた議事録は不要
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                list(columns.values()) + [job_id]
+            )
+
+    def counts(self):
+        """累計の件数・トークン数を返す"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT "
+                "SUM(state = 'archived') AS processed, "
+                "SUM(state = 'failed') AS failed, "
+                "COALESCE(SUM(prompt_tokens), 0) AS prompt_tokens, "
+                "COALESCE(SUM(completion_tokens), 0) AS completion_tokens "
+                "FROM jobs"
+            ).fetchone()
+        return {
+            "processed": row["processed"] or 0,
+            "failed": row["failed"] or 0,
+            "prompt_tokens": row["prompt_tokens"],
+            "completion_tokens": row["completion_tokens"]
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
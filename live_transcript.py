@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""会議中に追記されていく文字起こしの読み込み位置と、要約済みの内容の管理
+
+ファイルごとに読み込み済みのバイト位置を記録し、前回から追記された完全な行だけを返す。
+要約済みのメモ（notes）と、まだ要約していない発言（pending）は状態ファイル（JSON）に
+保存するため、途中で再起動しても続きから処理できる。ファイルの先頭が変わった（置き換えられた）
+場合や、記録より小さくなった場合は最初から読み直す。
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from atomic_file import write_atomic
+from transcript_loader import detect_encodings, SAMPLE_SIZE
+
+# 置き換えの判定に使う先頭部分のサイズ
+HEAD_SIZE = 4096
+# 改行で行を区切れる文字コード（UTF-16は対象外）
+LINE_ENCODINGS = ("utf-8", "utf-8-sig", "shift_jis", "cp932", "euc_jp")
+
+
+def new_state():
+    return {
+        "offset": 0,         # 読み込み済みのバイト数（行の区切りまで）
+        "head": None,        # 先頭 HEAD_SIZE バイトのハッシュ
+        "encoding": None,
+        "pending": "",       # 読み込み済みでまだ要約していない発言
+        "notes": [],         # 要約済みのメモ（古い順）
+        "segments": 0,       # 要約した区間の数
+        "usage_by_model": {}  # 要約に使ったトークン数（最終的な議事録の記録に加算する）
+    }
+
+
+def _head_hash(f, length):
+    f.seek(0)
+    return hashlib.sha1(f.read(min(length, HEAD_SIZE))).hexdigest()
+
+
+def _decode(data, state):
+    """バイト列をデコード（初回は文字コードを判定して state に記録、失敗時はNone）"""
+    if not state["encoding"] and data.isascii():
+        return data.decode("ascii")  # 日本語が出てくるまで文字コードは決めない
+    candidates = [state["encoding"]] if state["encoding"] else detect_encodings(data[:SAMPLE_SIZE])
+    for encoding in candidates:
+        if encoding not in LINE_ENCODINGS:
+            continue
+        try:
+            text = data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        state["encoding"] = encoding
+        return text
+    return None
+
+
+class LiveTranscripts:
+    """書き込み中の文字起こしファイルごとの状態を state_folder の JSON で管理"""
+
+    def __init__(self, state_folder):
+        self.state_folder = state_folder
+        self._lock = threading.Lock()
+        self._file_locks = {}  # ファイル名 → そのファイルの読み込み・要約を直列化するロック
+        os.makedirs(state_folder, exist_ok=True)
+
+    def lock_for(self, file_name):
+        with self._lock:
+            return self._file_locks.setdefault(file_name, threading.Lock())
+
+    def _state_path(self, file_name):
+        return os.path.join(self.state_folder, os.path.splitext(file_name)[0] + ".json")
+
+    def load(self, file_name):
+        """保存済みの状態を返す（無ければ新しい状態）"""
+        try:
+            with open(self._state_path(file_name), "r", encoding="utf-8") as f:
+                return dict(new_state(), **json.load(f))
+        except FileNotFoundError:
+            return new_state()
+        except (OSError, ValueError) as e:
+            logging.warning(f"ライブ処理の状態を読み込めないため最初から処理します: {file_name} - {e}")
+            return new_state()
+
+    def save(self, file_name, state):
+        write_atomic(self._state_path(file_name), json.dumps(state, ensure_ascii=False))
+
+    def exists(self, file_name):
+        return os.path.exists(self._state_path(file_name))
+
+    def discard(self, file_name):
+        """議事録の作成が終わったファイルの状態を削除"""
+        try:
+            os.remove(self._state_path(file_name))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._file_locks.pop(file_name, None)
+
+    def read_new(self, file_path, state, final=False):
+        """前回の位置以降に追記された完全な行を state["pending"] に追加し、追加した文字列を返す
+
+        final=True の場合は改行で終わっていない最後の行も読み込む。
+        ファイルが置き換えられていた場合は state を初期化して最初から読む。
+        """
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if state["offset"]:
+                if size < state["offset"] or _head_hash(f, state["offset"]) != state["head"]:
+                    logging.info(f"ファイルが置き換えられたため最初から読み直します: {file_path}")
+                    state.clear()
+                    state.update(new_state())
+            f.seek(state["offset"])
+            data = f.read(size - state["offset"])
+            if not final:
+                # 書きかけの行（と文字）は次回に回す
+                end = data.rfind(b"\n")
+                data = data[:end + 1] if end >= 0 else b""
+            if not data:
+                return ""
+            text = _decode(data, state)
+            if text is None:
+                raise ValueError(f"行単位で読み込める文字コードではありません: {file_path}")
+            state["offset"] += len(data)
+            state["head"] = _head_hash(f, state["offset"])
+        text = text.replace("\r\n", "\n")
+        state["pending"] += text
+        return text
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""ファイルごとの処理時間・トークン数・推定コストの記録
+
+処理が終わるたびに1行のJSONをJSONLファイルへ追記し、累計をPrometheusのテキスト形式で
+ファイルに書き出す（node_exporter の textfile collector で収集できる）。
+ポートを指定した場合は /metrics で同じ内容を返すHTTPサーバーも起動する。
+"""
+import json
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from atomic_file import write_atomic
+
+# 1Kトークンあたりの価格（USD, 入力・出力）。モデル情報.txt の価格目安
+MODEL_PRICES = {
+    "gpt-4-turbo": {"input": 0.01, "output": 0.03},
+    "gpt-4o": {"input": 0.005, "output": 0.015},
+    "gpt-3.5-turbo": {"input": 0.0005, "output": 0.0015},
+}
+
+# 段階ごとの所要時間のヒストグラムの区切り（秒）
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def model_price(model, prices=None):
+    """モデルの価格を返す（"gpt-4o-2024-08-06" のような版付きの名前は前方一致で探す）"""
+    table = dict(MODEL_PRICES)
+    table.update(prices or {})
+    if model in table:
+        return table[model]
+    matches = [name for name in table if model.startswith(name)]
+    return table[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(usage_by_model, prices=None):
+    """モデルごとのトークン数から推定コスト（USD）を計算（価格不明のモデルは含めない）"""
+    cost = 0.0
+    for model, usage in usage_by_model.items():
+        price = model_price(model, prices)
+        if price is None:
+            continue
+        cost += usage["prompt_tokens"] / 1000 * price["input"]
+        cost += usage["completion_tokens"] / 1000 * price["output"]
+    return cost
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Histogram:
+    """Prometheusのヒストグラム（累積バケット・合計・件数）"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, **labels):
+        lines = []
+        for bound, count in zip(self.buckets, self.counts):
+            lines.append(f"{name}_bucket{_labels(**labels, le=f'{bound:g}')} {count}")
+        lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {self.count}")
+        lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {self.sum:.6f}")
+        lines.append(f"{name}_count{_labels(**labels) if labels else ''} {self.count}")
+        return lines
+
+
+class MetricsRecorder:
+    """処理結果をJSONLに記録し、累計をPrometheus形式で公開する"""
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self._lock = threading.Lock()
+        self._files = {}  # 結果 → 件数
+        self._bytes = 0
+        self._saved_tokens = 0
+        self._stages = {}  # 段階 → Histogram
+        self._total = Histogram()
+        self._ttft = Histogram()
+        self._tokens = {}  # (モデル, 種類) → トークン数
+        self._cost = {}  # モデル → 推定コスト
+        self._server = None
+
+    def record(self, entry):
+        """1ファイル分の記録を追加（entry は JSONL にそのまま書き出す）"""
+        with self._lock:
+            result = entry["result"]
+            self._files[result] = self._files.get(result, 0) + 1
+            self._bytes += entry.get("bytes") or 0
+            self._saved_tokens += entry.get("preprocess_saved_tokens") or 0
+            self._total.observe(entry["total_seconds"])
+            for stage, seconds in entry["stages"].items():
+                self._stages.setdefault(stage, Histogram()).observe(seconds)
+            if entry.get("ttft_seconds") is not None:
+                self._ttft.observe(entry["ttft_seconds"])
+            for model, usage in entry["models"].items():
+                for kind in ("prompt", "completion"):
+                    key = (model, kind)
+                    self._tokens[key] = self._tokens.get(key, 0) + usage[f"{kind}_tokens"]
+                self._cost[model] = self._cost.get(model, 0.0) + usage["cost_usd"]
+
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            if self.prometheus_path:
+                write_atomic(self.prometheus_path, self._render())
+
+    def render(self):
+        """累計をPrometheusのテキスト形式で返す"""
+        with self._lock:
+            return self._render()
+
+    def _render(self):
+        lines = [
+            "# HELP aimatome_files_total 処理したファイル数（result: success / failed）",
+            "# TYPE aimatome_files_total counter",
+        ]
+        lines += [f"aimatome_files_total{_labels(result=result)} {count}" for result, count in sorted(self._files.items())]
+        lines += [
+            "# HELP aimatome_input_bytes_total 処理した文字起こしの合計バイト数",
+            "# TYPE aimatome_input_bytes_total counter",
+            f"aimatome_input_bytes_total {self._bytes}",
+            "# HELP aimatome_file_duration_seconds 1ファイルの処理時間",
+            "# TYPE aimatome_file_duration_seconds histogram",
+        ]
+        lines += self._total.render("aimatome_file_duration_seconds")
+        lines += [
+            "# HELP aimatome_stage_duration_seconds 段階（reading / generating / writing / archiving）ごとの処理時間",
+            "# TYPE aimatome_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in sorted(self._stages.items()):
+            lines += histogram.render("aimatome_stage_duration_seconds", stage=stage)
+        lines += [
+            "# HELP aimatome_ttft_seconds ストリーミングで最初のトークンを受信するまでの時間",
+            "# TYPE aimatome_ttft_seconds histogram",
+        ]
+        lines += self._ttft.render("aimatome_ttft_seconds")
+        lines += [
+            "# HELP aimatome_tokens_total 使用したトークン数（type: prompt / completion）",
+            "# TYPE aimatome_tokens_total counter",
+        ]
+        lines += [
+            f"aimatome_tokens_total{_labels(model=model, type=kind)} {count}"
+            for (model, kind), count in sorted(self._tokens.items())
+        ]
+        lines += [
+            "# HELP aimatome_preprocess_saved_tokens_total 前処理で削減した入力トークン数",
+            "# TYPE aimatome_preprocess_saved_tokens_total counter",
+            f"aimatome_preprocess_saved_tokens_total {self._saved_tokens}",
+            "# HELP aimatome_cost_usd_total 推定コスト（USD）",
+            "# TYPE aimatome_cost_usd_total counter",
+        ]
+        lines += [f"aimatome_cost_usd_total{_labels(model=model)} {cost:.6f}" for model, cost in sorted(self._cost.items())]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """/metrics でPrometheus形式の累計を返すHTTPサーバーを起動"""
+        recorder = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = recorder.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info(f"メトリクスを公開します: http://{host}:{self._server.server_address[1]}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
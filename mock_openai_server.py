@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""動作確認用のOpenAI API互換ローカルサーバー（APIキー・課金不要）
+
+対応エンドポイント:
+  POST /v1/chat/completions（stream対応）
+  POST /v1/files, GET /v1/files/{id}/content
+  POST /v1/batches, GET /v1/batches/{id}
+
+ベンチマーク用に、応答までの遅延・生成速度・エラー率・429（レート制限）の発生率を指定できる。
+
+使い方:
+  python mock_openai_server.py --port 8000
+  python mock_openai_server.py --port 8000 --latency 0.8 --token-rate 80 --rate-limit-rate 0.05
+  .env に OPENAI_BASE_URL=http://127.0.0.1:8000/v1 を設定して auto_processor.py を起動
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from email import policy
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def fake_minutes(messages):
+    """入力から決まった形式の議事録らしいテキストを作る"""
+    content = messages[-1].get("content", "") if messages else ""
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    summary = "\n".join(f"- {line[:60]}" for line in lines[:5]) or "- （内容なし）"
+    return (
+        "# 議事録\n## 日時・参加者\n- テスト\n## 議題\n"
+        f"{summary}\n## 決定事項\n- なし\n## アクションアイテム\n- なし\n## 次回予定\n- 未定\n"
+        f"（入力 {len(content)} 文字）\n"
+    )
+
+
+def usage_for(messages, text):
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(text),
+        "total_tokens": prompt_tokens + len(text)
+    }
+
+
+def completion_body(body):
+    """chat.completions の非ストリーミング応答を作る"""
+    messages = body.get("messages", [])
+    text = fake_minutes(messages)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": usage_for(messages, text)
+    }
+
+
+class MockState:
+    """アップロードされたファイルとバッチジョブ、chat.completions の応答設定をメモリ上に保持
+
+    latency: 最初のトークンを返すまでの秒数
+    token_rate: 1秒あたりに生成する出力トークン数（0は待ち時間なし）
+    error_rate: 500エラーを返す確率
+    rate_limit_rate: 429（retry-after 付き）を返す確率
+    """
+
+    def __init__(self, batch_delay=1.0, latency=0.0, token_rate=0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1.0):
+        self.lock = threading.Lock()
+        self.files = {}
+        self.batches = {}
+        self.batch_delay = batch_delay
+        self.latency = latency
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def next_fault(self):
+        """今回のリクエストで返すエラーを決める（"rate_limited" / "errors" / None）"""
+        roll = random.random()
+        fault = None
+        if roll < self.rate_limit_rate:
+            fault = "rate_limited"
+        elif roll < self.rate_limit_rate + self.error_rate:
+            fault = "errors"
+        with self.lock:
+            self.counts["requests"] += 1
+            if fault:
+                self.counts[fault] += 1
+        return fault
+
+    def generation_delay(self, tokens):
+        """tokens 個の出力トークンを生成するのにかかる秒数"""
+        return tokens / self.token_rate if self.token_rate > 0 else 0
+
+    def add_file(self, filename, data, purpose):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        info = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+        with self.lock:
+            self.files[file_id] = (info, data)
+        return info
+
+    def create_batch(self, body):
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": body.get("endpoint", "/v1/chat/completions"),
+            "input_file_id": body["input_file_id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "validating",
+            "created_at": int(time.time())
+        }
+        with self.lock:
+            self.batches[batch_id] = batch
+        threading.Thread(target=self._run_batch, args=(batch_id,), daemon=True).start()
+        return batch
+
+    def _run_batch(self, batch_id):
+        """バッチ内の各リクエストを処理して結果ファイルを作成"""
+        with self.lock:
+            batch = self.batches[batch_id]
+            batch["status"] = "in_progress"
+            batch["in_progress_at"] = int(time.time())
+            _, data = self.files[batch["input_file_id"]]
+        time.sleep(self.batch_delay)
+        outputs = []
+        errors = []
+        for line in data.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if not request.get("body", {}).get("messages"):
+                errors.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": request.get("custom_id"),
+                    "response": None,
+                    "error": {"code": "invalid_request", "message": "messages is required"}
+                })
+                continue
+            outputs.append({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": request.get("custom_id"),
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion_body(request["body"])},
+                "error": None
+            })
+        output_info = self.add_file("batch_output.jsonl", "".join(json.dumps(o, ensure_ascii=False) + "\n" for o in outputs).encode("utf-8"), "batch_output")
+        error_info = self.add_file("batch_errors.jsonl", "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in errors).encode("utf-8"), "batch_output") if errors else None
+        with self.lock:
+            batch.update({
+                "status": "completed",
+                "completed_at": int(time.time()),
+                "output_file_id": output_info["id"],
+                "error_file_id": error_info["id"] if error_info else None,
+                "request_counts": {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
+            })
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # MockState（サーバー起動時に設定）
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, data, status=200, headers=None):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json({"error": {"message": message, "type": "mock_error", "code": status}}, status, headers)
+
+    def do_POST(self):
+        if self.path.endswith("/chat/completions"):
+            self.handle_chat(json.loads(self._read_body() or b"{}"))
+        elif self.path.endswith("/files"):
+            self.handle_upload()
+        elif self.path.endswith("/batches"):
+            body = json.loads(self._read_body() or b"{}")
+            if body.get("input_file_id") not in self.state.files:
+                self._send_error(404, "input file not found")
+                return
+            self._send_json(self.state.create_batch(body))
+        else:
+            self._send_error(404, f"unknown path: {self.path}")
+
+    def do_GET(self):
+        match = re.search(r"/files/([^/]+)/content$", self.path)
+        if match:
+            entry = self.state.files.get(match.group(1))
+            if entry is None:
+                self._send_error(404, "file not found")
+                return
+            data = entry[1]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        match = re.search(r"/batches/([^/]+)$", self.path)
+        if match:
+            with self.state.lock:
+                batch = dict(self.state.batches.get(match.group(1)) or {})
+            if not batch:
+                self._send_error(404, "batch not found")
+                return
+            self._send_json(batch)
+            return
+        self._send_error(404, f"unknown path: {self.path}")
+
+    def handle_chat(self, body):
+        fault = self.state.next_fault()
+        if fault == "rate_limited":
+            self._send_error(429, "Rate limit reached (mock)", {"retry-after": f"{self.state.retry_after:g}"})
+            return
+        if fault == "errors":
+            self._send_error(500, "Internal server error (mock)")
+            return
+        response = completion_body(body)
+        text = response["choices"][0]["message"]["content"]
+        time.sleep(self.state.latency)
+        if not body.get("stream"):
+            time.sleep(self.state.generation_delay(response["usage"]["completion_tokens"]))
+            self._send_json(response)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_chunk(choices, usage=None):
+            chunk = {
+                "id": response["id"],
+                "object": "chat.completion.chunk",
+                "created": response["created"],
+                "model": response["model"],
+                "choices": choices
+            }
+            if usage is not None:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for piece in re.findall(r".{1,16}", text, re.S):
+            time.sleep(self.state.generation_delay(len(piece)))
+            send_chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        send_chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send_chunk([], response["usage"])
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def handle_upload(self):
+        """multipart/form-data でアップロードされたファイルを保存"""
+        raw = self._read_body()
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        message = BytesParser(policy=policy.default).parsebytes(header + raw)
+        data = b""
+        filename = "upload.jsonl"
+        purpose = "batch"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                data = part.get_payload(decode=True) or b""
+                filename = part.get_filename() or filename
+            elif name == "purpose":
+                purpose = (part.get_payload(decode=True) or b"batch").decode("utf-8")
+        self._send_json(self.state.add_file(filename, data, purpose))
+
+
+def create_server(host="127.0.0.1", port=8000, state=None):
+    """モックサーバーを作成（serve_forever() は呼び出し側で実行）"""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state or MockState()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI API互換のローカルモックサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="バッチ完了までの秒数")
+    parser.add_argument("--latency", type=float, default=0.0, help="最初のトークンを返すまでの秒数")
+    parser.add_argument("--token-rate", type=float, default=0, help="1秒あたりの出力トークン数（0は待ち時間なし）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500エラーを返す確率（0〜1）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429を返す確率（0〜1）")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429応答の retry-after 秒数")
+    args = parser.parse_args()
+
+    state = MockState(
+        batch_delay=args.batch_delay,
+        latency=args.latency,
+        token_rate=args.token_rate,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+    server = create_server(args.host, args.port, state)
+    print(f"モックサーバーを起動しました: http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""入力のトークン数に応じたモデルの選択と max_tokens の調整
+
+model_routes に「max_input_tokens 以下ならこのモデル」という規則を上から順に並べる。
+どの規則にも当てはまらない場合は model を使う。選んだモデルのコンテキストに入力と
+min_output_tokens 以上の出力が収まらない場合は InputTooLongError を送出する。
+"""
+
+# モデルごとのコンテキスト長（入力と出力の合計トークン数）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+
+# メッセージの区切りなどで入力に加算されるトークン数の目安
+MESSAGE_OVERHEAD_TOKENS = 16
+
+
+class InputTooLongError(ValueError):
+    """入力がモデルのコンテキストに収まらない"""
+
+
+def context_window(model, overrides=None):
+    """モデルのコンテキスト長を返す（不明ならNone、版付きの名前は前方一致で探す）"""
+    table = dict(MODEL_CONTEXT_WINDOWS)
+    table.update(overrides or {})
+    if model in table:
+        return table[model]
+    matches = [name for name in table if model.startswith(name)]
+    return table[max(matches, key=len)] if matches else None
+
+
+def route_model(input_tokens, config):
+    """入力トークン数に合うモデルを model_routes から選ぶ"""
+    for route in config.get("model_routes") or []:
+        limit = route.get("max_input_tokens")
+        if limit is None or input_tokens <= limit:
+            return route["model"]
+    return config.get("model", "gpt-4-turbo")
+
+
+def plan_request(input_tokens, config, max_tokens=None):
+    """使うモデルと、コンテキストに収まる max_tokens を (モデル, max_tokens) で返す"""
+    model = route_model(input_tokens, config)
+    max_tokens = max_tokens or config.get("max_tokens", 4096)
+    window = context_window(model, config.get("context_windows"))
+    if window is None:
+        return model, max_tokens
+    available = window - input_tokens - MESSAGE_OVERHEAD_TOKENS
+    min_output = min(max_tokens, config.get("min_output_tokens", 1024))
+    if available < min_output:
+        raise InputTooLongError(
+            f"入力{input_tokens}トークンは {model} のコンテキスト（{window}トークン）に収まりません"
+        )
+    return model, min(max_tokens, available)
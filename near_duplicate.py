@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""処理済みの文字起こしとほぼ同じ内容の文字起こしの検出（MinHash + LSH）
+
+同じ会議を書き出し直したファイルは、音声認識の細かな違いや先頭の削除でハッシュが一致しない。
+文字起こしを文字の n-gram（シングル）の集合として MinHash の署名を作り、署名を band ごとに
+まとめたバケットを SQLite に登録しておく。検索時は同じバケットに入った候補だけを署名で比較する
+ため、処理済みのファイルが増えても全件と比較することはない。
+
+署名はファイルごとに1回のハッシュ計算で作る one permutation hashing（空の区画は隣から補う）。
+"""
+import re
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from datetime import datetime
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 128
+BANDS = 32  # 1 band = NUM_HASHES / BANDS 個の値。類似度0.5前後から候補になる
+MAX_VALUE = (1 << 64) - 1
+
+# 署名に使わない文字（空白・句読点・記号・数字）。タイムスタンプや改行位置の違いを無視する
+_IGNORED = re.compile(r"[\s\d\W_]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT NOT NULL,
+    archive_path TEXT NOT NULL UNIQUE,
+    minutes_paths TEXT,
+    signature BLOB NOT NULL,
+    added_at TEXT
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_band ON buckets (band, bucket);
+CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (doc_id);
+"""
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """空白・記号・数字を除いた文字列の size 文字ごとの集合"""
+    text = _IGNORED.sub("", unicodedata.normalize("NFKC", text).lower())
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(text, num_hashes=NUM_HASHES):
+    """MinHash の署名（num_hashes 個の整数、内容が空ならNone）"""
+    values = [MAX_VALUE] * num_hashes
+    items = shingles(text)
+    if not items:
+        return None
+    for item in items:
+        h = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little")
+        slot, value = h % num_hashes, h // num_hashes
+        if value < values[slot]:
+            values[slot] = value
+    # 短い文字起こしで空になった区画は右隣の値で補う（補った値は距離を加えて本来の値と区別する）
+    original = list(values)
+    for slot in range(num_hashes):
+        offset = 0
+        while original[(slot + offset) % num_hashes] == MAX_VALUE:
+            offset += 1
+        values[slot] = original[(slot + offset) % num_hashes] + (offset << 57)
+    return values
+
+
+def similarity(a, b):
+    """2つの署名から推定した Jaccard 類似度"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def _band_buckets(values, bands=BANDS):
+    """署名を band ごとに区切ったバケット番号（SQLiteの整数に収まる63ビット）"""
+    rows = len(values) // bands
+    for band in range(bands):
+        chunk = array("Q", values[band * rows:(band + 1) * rows]).tobytes()
+        yield band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little") >> 1
+
+
+class NearDuplicateIndex:
+    """処理済みの文字起こしの署名を SQLite に保存し、ほぼ同じ内容のものを探す"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def add(self, file_name, archive_path, minutes_paths, values):
+        """処理済みの文字起こしを登録（同じアーカイブパスは置き換え）"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT id FROM documents WHERE archive_path = ?", (archive_path,)).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM buckets WHERE doc_id = ?", (row["id"],))
+                    self._conn.execute("DELETE FROM documents WHERE id = ?", (row["id"],))
+                cursor = self._conn.execute(
+                    "INSERT INTO documents (file_name, archive_path, minutes_paths, signature, added_at) VALUES (?, ?, ?, ?, ?)",
+                    (file_name, archive_path, "\n".join(minutes_paths), array("Q", values).tobytes(),
+                     datetime.now().isoformat(timespec="seconds"))
+                )
+                self._conn.executemany(
+                    "INSERT INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+                    ((band, bucket, cursor.lastrowid) for band, bucket in _band_buckets(values))
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def find(self, values, threshold, exclude=None):
+        """類似度が threshold 以上で最も近い登録済みの文字起こしを辞書で返す（無ければNone）
+
+        exclude にアーカイブパスを指定すると、そのファイル（同じ名前で置き直したもの）は除く。
+        """
+        with self._lock:
+            candidates = set()
+            for band, bucket in _band_buckets(values):
+                candidates.update(
+                    row["doc_id"] for row in self._conn.execute(
+                        "SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                    )
+                )
+            if not candidates:
+                return None
+            rows = self._conn.execute(
+                f"SELECT * FROM documents WHERE id IN ({','.join('?' * len(candidates))})", list(candidates)
+            ).fetchall()
+        best = None
+        for row in rows:
+            if row["archive_path"] == exclude:
+                continue
+            stored = array("Q")
+            stored.frombytes(row["signature"])
+            score = similarity(values, stored)
+            if score >= threshold and (best is None or score > best["similarity"]):
+                best = {
+                    "file_name": row["file_name"],
+                    "archive_path": row["archive_path"],
+                    "minutes_paths": [path for path in (row["minutes_paths"] or "").split("\n") if path],
+                    "similarity": score
+                }
+        return best
+
+    def known_paths(self):
+        with self._lock:
+            return {row["archive_path"] for row in self._conn.execute("SELECT archive_path FROM documents")}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
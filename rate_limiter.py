@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""モデルごとのリクエスト数・トークン数の上限に合わせてAPI呼び出しを待機・再試行する"""
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+import openai
+
+
+class TokenBucket:
+    """1分あたりの上限量を一定速度で補充するトークンバケット"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount):
+        """amount分を予約し、使用可能になるまでの待ち秒数を返す
+
+        残量が足りなくても先に差し引く（マイナス残高）ため、後から来た呼び出しは
+        その分さらに待つことになり、到着順に順番待ちができる。
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """モデルごとのRPM/TPMバケットを管理
+
+    limits の例: {"gpt-4o": {"rpm": 500, "tpm": 30000}, "default": {"rpm": 60}}
+    """
+
+    def __init__(self, limits=None):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._paused_until = {}
+        self.limits = {}
+        self.configure(limits or {})
+
+    def configure(self, limits):
+        """上限設定を更新（変更されたモデルのバケットは作り直す）"""
+        with self._lock:
+            for model in list(self._buckets):
+                if self.limits.get(model) != limits.get(model):
+                    del self._buckets[model]
+            self.limits = dict(limits)
+
+    def _get_buckets(self, model):
+        if model not in self._buckets:
+            limit = self.limits.get(model) or self.limits.get("default") or {}
+            self._buckets[model] = (
+                TokenBucket(limit["rpm"]) if limit.get("rpm") else None,
+                TokenBucket(limit["tpm"]) if limit.get("tpm") else None
+            )
+        return self._buckets[model]
+
+    def acquire(self, model, tokens):
+        """1リクエスト分（推定tokensトークン）の枠が空くまで待機"""
+        with self._lock:
+            rpm_bucket, tpm_bucket = self._get_buckets(model)
+            wait = max(
+                rpm_bucket.reserve(1) if rpm_bucket else 0.0,
+                tpm_bucket.reserve(tokens) if tpm_bucket else 0.0,
+                self._paused_until.get(model, 0.0) - time.monotonic()
+            )
+        if wait > 0:
+            logging.info(f"レート制限のため{wait:.1f}秒待機します（{model}）")
+            time.sleep(wait)
+
+    def pause(self, model, seconds):
+        """429を受けた場合など、同じモデルへの呼び出しを全ワーカーで一時停止"""
+        with self._lock:
+            self._paused_until[model] = max(self._paused_until.get(model, 0.0), time.monotonic() + seconds)
+
+
+def is_retryable(error):
+    """レート制限・一時的なサーバーエラー・接続エラーなら再試行する"""
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+def retry_after_seconds(error):
+    """エラー応答の Retry-After / retry-after-ms ヘッダーから待ち秒数を取得"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(func, limiter=None, model=None, max_retries=6, base_delay=2.0, max_delay=60.0):
+    """func を呼び出し、再試行可能なエラーなら指数バックオフ（ジッター付き）で再試行"""
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+            else:
+                delay += random.uniform(0, 0.5)
+            if limiter is not None and getattr(e, "status_code", None) == 429:
+                limiter.pause(model, delay)
+            attempt += 1
+            logging.warning(f"API呼び出しを{delay:.1f}秒後に再試行します（{attempt}/{max_retries}回目）: {e}")
+            time.sleep(delay)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""文字起こしの内容と生成設定をキーに、生成済みの議事録を保存するキャッシュ"""
+import os
+import time
+import json
+import hashlib
+import logging
+import threading
+from atomic_file import write_atomic
+
+# キーに含める生成設定（これらが変わると別の議事録として扱う）
+KEY_FIELDS = ("system_prompt", "model", "temperature", "max_tokens", "model_routes", "output_formats")
+# 期限切れのエントリを確認する間隔（秒）。容量は保存のたびに合計で確認する
+EVICT_INTERVAL = 3600
+# 容量上限を超えたら、続けて削除が走らないよう上限のこの割合まで減らす
+EVICT_TARGET = 0.9
+
+
+class ResultCache:
+    """ディスク上の議事録キャッシュ（サイズ・経過日数で古いものから削除）
+
+    合計サイズは保存のたびに加算して管理し、フォルダ全体を調べるのは容量上限を
+    超えた時と EVICT_INTERVAL 秒ごとだけにする（他のプロセスが書いた分もその時に反映される）。
+    """
+
+    def __init__(self, folder, max_bytes=200 * 1024 * 1024, max_age_days=90):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total = 0  # キャッシュの合計サイズ（バイト）
+        self._next_evict = 0
+        os.makedirs(folder, exist_ok=True)
+        self.evict()
+
+    @staticmethod
+    def make_key(transcript, config):
+        """文字起こしと生成設定からキャッシュキー（SHA-256）を作成"""
+        digest = hashlib.sha256()
+        if isinstance(transcript, str):
+            transcript = transcript.encode("utf-8")
+        digest.update(transcript)
+        # 未設定の項目は含めない（項目を追加しても既存のキャッシュが無効にならないように）
+        settings = {field: config.get(field) for field in KEY_FIELDS if config.get(field) not in (None, [], {})}
+        digest.update(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.txt")
+
+    def get(self, key):
+        """キャッシュされた議事録を返す（無ければNone）"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # 最近使ったものを削除対象から外す
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, text):
+        """議事録をキャッシュに保存"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        write_atomic(path, text)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            self._total += size - previous
+            due = (self.max_bytes and self._total > self.max_bytes) or time.monotonic() >= self._next_evict
+        if due:
+            self.evict()
+
+    def evict(self):
+        """期限切れのエントリと、容量上限を超えた分の古いエントリを削除"""
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.folder):
+                for name in files:
+                    if not name.endswith(".txt"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            now = time.time()
+            total = sum(size for _, size, _ in entries)
+            limit = self.max_bytes * EVICT_TARGET if self.max_bytes and total > self.max_bytes else self.max_bytes
+            removed = 0
+            for mtime, size, path in sorted(entries):
+                expired = self.max_age_seconds and now - mtime > self.max_age_seconds
+                if not expired and (not limit or total <= limit):
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            self._total = total
+            self._next_evict = time.monotonic() + EVICT_INTERVAL
+            if removed:
+                logging.info(f"キャッシュから{removed}件を削除しました")
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""議事録（output/）と処理済みの文字起こし（archive/）の全文検索インデックス
+
+日本語は分かち書きせずに文字の2-gramと1文字ずつ、英数字は単語ごとに転置インデックス（SQLite）へ登録し、
+BM25で順位付けして返す。auto_processor はファイルを処理するたびに議事録と文字起こしを
+追加し、フォルダごとの件数と最新のファイルを manifest.json に書き出す（start.py はこれを読む）。
+
+使い方:
+  python search_index.py 予算 配分                 # 検索（上位10件）
+  python search_index.py "効果測定" --kind minutes  # 議事録だけを検索
+  python search_index.py --rebuild                 # output/ と archive/ を走査して作り直す
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from atomic_file import write_atomic
+from transcript_loader import load_transcript
+
+INDEX_DB = "minutes_index.db"
+# 登録する語の作り方を変えたら上げる（古いインデックスは空にして起動時の同期で登録し直す）
+INDEX_VERSION = 2
+MANIFEST = "manifest.json"
+KINDS = ("minutes", "transcript")
+# manifest.json に記録する最新ファイルの件数
+LATEST_COUNT = 5
+# BM25のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 英数字の単語、または日本語（ひらがな・カタカナ・漢字）の連続
+_TOKEN = re.compile(r"[0-9a-z_]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff々〆]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    bytes INTEGER,
+    mtime REAL,
+    length INTEGER,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+CREATE INDEX IF NOT EXISTS documents_kind ON documents (kind, mtime);
+"""
+
+
+def normalize(text):
+    """全角英数・半角カナを揃え、英字を小文字にする"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text, unigrams=False):
+    """検索語の列を返す（日本語は文字の2-gram、1文字だけの語はその1文字、英数字は単語）
+
+    unigrams=True（文書の登録時）は日本語の各文字も加え、1文字の検索語（「案」など）でも見つかるようにする。
+    """
+    terms = []
+    for run in _TOKEN.findall(normalize(text)):
+        if run.isascii() or len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if unigrams:
+                terms.extend(run)
+    return terms
+
+
+def snippet(text, query, width=40):
+    """検索語が最初に現れる付近の抜粋（見つからなければ先頭）"""
+    normalized = normalize(text)
+    positions = [normalized.find(word) for word in normalize(query).split()]
+    positions = [position for position in positions if position >= 0]
+    start = max(0, min(positions) - width // 2) if positions else 0
+    excerpt = " ".join(text[start:start + width * 2].split())
+    return ("…" if start else "") + excerpt + ("…" if start + width * 2 < len(text) else "")
+
+
+class SearchIndex:
+    """スレッド間で共有できる全文検索インデックス"""
+
+    def __init__(self, folder, folders=None):
+        """folder にインデックスと manifest.json を置く。folders は 種類 → フォルダ（同期・件数の対象）"""
+        self.folder = folder
+        self.folders = folders or {}
+        os.makedirs(folder, exist_ok=True)
+        self.manifest_path = os.path.join(folder, MANIFEST)
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()  # 一時ファイル名が同じため書き出しは1つずつ
+        self._conn = sqlite3.connect(os.path.join(folder, INDEX_DB), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+            if self._conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+                logging.info("検索インデックスの形式が古いため作り直します")
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def _now(self):
+        return datetime.now().isoformat(timespec="seconds")
+
+    def add(self, path, kind, text=None):
+        """ファイルを登録（登録済みなら置き換え）。text を省略するとファイルから読み込む"""
+        if kind not in KINDS:
+            raise ValueError(f"不明な種類: {kind}")
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        if text is None:
+            text, _ = load_transcript(path)
+        counts = Counter(tokenize(text, unigrams=True))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._remove(path)
+                cursor = self._conn.execute(
+                    "INSERT INTO documents (path, name, kind, bytes, mtime, length, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (path, os.path.basename(path), kind, stat.st_size, stat.st_mtime, sum(counts.values()), self._now())
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    ((term, cursor.lastrowid, tf) for term, tf in counts.items())
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _remove(self, path):
+        row = self._conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (row["id"],))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (row["id"],))
+
+    def remove(self, path):
+        with self._lock:
+            self._remove(os.path.abspath(path))
+
+    def sync(self):
+        """folders の .txt ファイルと突き合わせ、追加・更新されたものを登録し、無くなったものを削除"""
+        with self._lock:
+            known = {
+                row["path"]: (row["bytes"], row["mtime"])
+                for row in self._conn.execute("SELECT path, bytes, mtime FROM documents")
+            }
+        added = removed = 0
+        seen = set()
+        for kind, folder in self.folders.items():
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.endswith(".txt") or not entry.is_file():
+                    continue
+                path = os.path.abspath(entry.path)
+                seen.add(path)
+                stat = entry.stat()
+                if known.get(path) == (stat.st_size, stat.st_mtime):
+                    continue
+                try:
+                    self.add(path, kind)
+                    added += 1
+                except (OSError, UnicodeDecodeError) as e:
+                    logging.warning(f"検索インデックスに登録できません: {path} - {e}")
+        for path in set(known) - seen:
+            self.remove(path)
+            removed += 1
+        if added or removed:
+            logging.info(f"検索インデックスを更新しました（追加・更新 {added}件, 削除 {removed}件）")
+        self.write_manifest()
+        return added, removed
+
+    def search(self, query, limit=10, kind=None):
+        """検索語をすべて含む文書をBM25の高い順に [(スコア, 行)] で返す"""
+        terms = Counter(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            stats = self._conn.execute(
+                "SELECT COUNT(*) AS n, AVG(length) AS avg_length FROM documents" + (" WHERE kind = ?" if kind else ""),
+                (kind,) if kind else ()
+            ).fetchone()
+            placeholders = ",".join("?" * len(terms))
+            rows = self._conn.execute(
+                f"SELECT p.term, p.doc_id, p.tf, d.length FROM postings p JOIN documents d ON d.id = p.doc_id "
+                f"WHERE p.term IN ({placeholders})" + (" AND d.kind = ?" if kind else ""),
+                list(terms) + ([kind] if kind else [])
+            ).fetchall()
+        total, avg_length = stats["n"], stats["avg_length"] or 1
+        postings = {}  # 語 → [(文書ID, tf, 文書の長さ)]
+        for row in rows:
+            postings.setdefault(row["term"], []).append((row["doc_id"], row["tf"], row["length"]))
+        if len(postings) < len(terms):
+            return []  # 含まれない語がある
+
+        scores = {}
+        matched = Counter()
+        for term, weight in terms.items():
+            entries = postings[term]
+            idf = math.log(1 + (total - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc_id, tf, length in entries:
+                norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * norm
+                matched[doc_id] += 1
+        ranked = sorted(
+            (doc_id for doc_id in scores if matched[doc_id] == len(terms)),
+            key=lambda doc_id: scores[doc_id], reverse=True
+        )[:limit]
+        if not ranked:
+            return []
+        with self._lock:
+            documents = {
+                row["id"]: row for row in self._conn.execute(
+                    f"SELECT * FROM documents WHERE id IN ({','.join('?' * len(ranked))})", ranked
+                )
+            }
+        return [(scores[doc_id], documents[doc_id]) for doc_id in ranked if doc_id in documents]
+
+    def manifest(self):
+        """種類ごとの件数・最新のファイルと、登録済みの文書数"""
+        folders = {}
+        with self._lock:
+            for kind, folder in self.folders.items():
+                count = self._conn.execute("SELECT COUNT(*) FROM documents WHERE kind = ?", (kind,)).fetchone()[0]
+                latest = [
+                    row["name"] for row in self._conn.execute(
+                        "SELECT name FROM documents WHERE kind = ? ORDER BY mtime DESC LIMIT ?", (kind, LATEST_COUNT)
+                    )
+                ]
+                folders[kind] = {"folder": folder, "count": count, "latest": latest}
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"folders": folders, "documents": documents, "updated_at": self._now()}
+
+    def write_manifest(self):
+        with self._manifest_lock:
+            write_atomic(self.manifest_path, json.dumps(self.manifest(), ensure_ascii=False, indent=2))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def load_manifest(folder):
+    """manifest.json を読み込む（存在しない・読めない場合はNone）"""
+    try:
+        with open(os.path.join(folder, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="議事録と文字起こしの全文検索")
+    parser.add_argument("query", nargs="*", help="検索語（空白区切りで複数指定するとすべてを含むものを返す）")
+    parser.add_argument("--kind", choices=KINDS, help="minutes: 議事録のみ / transcript: 文字起こしのみ")
+    parser.add_argument("--limit", type=int, default=10, help="表示する件数")
+    parser.add_argument("--rebuild", action="store_true", help="output/ と archive/ を走査してインデックスを更新する")
+    args = parser.parse_args()
+
+    # 設定ファイルのフォルダ（相対パスはこのスクリプトの場所から）を使う
+    root = os.path.dirname(os.path.abspath(__file__))
+    config = {}
+    try:
+        with open(os.path.join(root, "auto_config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(root, path)
+
+    index = SearchIndex(
+        resolve(config.get("index_folder", "index")),
+        {
+            "minutes": resolve(config.get("output_folder", "output")),
+            "transcript": resolve(config.get("processed_folder", "archive"))
+        }
+    )
+    try:
+        if args.rebuild:
+            logging.basicConfig(level=logging.INFO, format="%(message)s")
+            started = time.perf_counter()
+            added, removed = index.sync()
+            print(f"インデックスを更新しました: 追加・更新 {added}件 / 削除 {removed}件（{time.perf_counter() - started:.1f}秒）")
+        if not args.query:
+            if not args.rebuild:
+                parser.print_help()
+            return 0
+        query = " ".join(args.query)
+        started = time.perf_counter()
+        hits = index.search(query, args.limit, args.kind)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"「{query}」: {len(hits)}件（{elapsed:.1f}ms）")
+        for rank, (score, document) in enumerate(hits, 1):
+            label = "議事録" if document["kind"] == "minutes" else "文字起こし"
+            print(f"{rank:>2}. [{label}] {document['name']}  (スコア {score:.2f})")
+            try:
+                text, _ = load_transcript(document["path"])
+                print(f"    {snippet(text, query)}")
+            except (OSError, UnicodeDecodeError):
+                print(f"    （ファイルが見つかりません: {document['path']}）")
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+"""処理段階の表示名（auto_processor のログ・status.txt と start.py の画面で共通）"""
+
+STAGE_LABELS = {
+    "reading": "読み込み中",
+    "generating": "生成中",
+    "writing": "保存中",
+    "archiving": "移動中",
+    "live": "ライブ要約中"
+}
@@ -1,8 +1,12 @@
 import os
 import time
 import sys
+import json
 import subprocess
 from datetime import datetime
+from transcript_loader import read_tail_lines
+from search_index import load_manifest
+from stage_labels import STAGE_LABELS
 
 # msvcrtはWindows専用のモジュール
 import msvcrt
@@ -15,8 +19,41 @@ def clear_screen():
     """画面をクリアする"""
     os.system('cls')
 
+def format_status_time(value):
+    """status.json の日時（ISO形式）を表示用に変換する"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).strftime('%Y年%m月%d日 %H時%M分')
+
+def load_status_json():
+    """status.json を読み込む（存在しない・読めない場合はNone）"""
+    status_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "status.json")
+    try:
+        with open(status_path, "r", encoding="utf-8") as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    jobs = [
+        f"{job['file']}（{STAGE_LABELS.get(job['stage'], job['stage'])}）"
+        for job in status.get("jobs", [])
+    ]
+    return (
+        format_status_time(status.get("last_check")),
+        format_status_time(status.get("next_check")),
+        status.get("processed_count", 0),
+        status.get("error_count", 0),
+        status.get("last_error"),
+        ", ".join(jobs) or None,
+        status.get("last_processed")
+    )
+
 def parse_status_file():
-    """ステータスファイルを解析する"""
+    """ステータスを取得する（status.json が無い場合は status.txt を解析する）"""
+    status = load_status_json()
+    if status is not None:
+        return status
+    
     status_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "status.txt")
     last_check = None
     next_check = None
@@ -74,35 +111,40 @@ def parse_log_file():
     
     try:
         if os.path.exists(log_path):
-            # UTF-8を最初に試し、それから他のエンコーディングを試す
-            encodings = ['utf-8', 'shift_jis', 'cp932', 'euc_jp']
-            for encoding in encodings:
-                try:
-                    with open(log_path, "r", encoding=encoding) as f:
-                        logs = f.readlines()[-5:]  # 最新の5行を取得
-                    break  # 成功したらループを抜ける
-                except UnicodeDecodeError:
-                    continue  # 次のエンコーディングを試す
-            
-            if not logs:  # すべてのエンコーディングが失敗した場合
+            # 末尾だけを読むため、ログが大きくなっても更新にかかる時間は変わらない
+            try:
+                logs = read_tail_lines(log_path, 5)  # 最新の5行を取得
+            except UnicodeDecodeError:  # すべてのエンコーディングが失敗した場合
                 logs = ["ログファイルの読み込みに失敗しました。エンコーディングの問題かもしれません。"]
     except Exception as e:
         logs = [f"ログファイル読み込みエラー: {e}"]
     
     return logs
 
+def list_folder(path):
+    """フォルダ内の.txtファイルの (件数, 最新のファイル名) を返す"""
+    files = [f for f in os.listdir(path) if f.endswith('.txt')] if os.path.exists(path) else []
+    return len(files), files[-1] if files else None
+
 def get_file_info():
-    """フォルダ内のファイル情報を取得する"""
-    root_path = os.path.dirname(os.path.abspath(__file__))
-    input_path = os.path.join(root_path, "input")
-    output_path = os.path.join(root_path, "output")
-    archive_path = os.path.join(root_path, "archive")
+    """フォルダ内のファイル情報を (件数, 最新のファイル名) で取得する
     
-    input_files = [f for f in os.listdir(input_path) if f.endswith('.txt')] if os.path.exists(input_path) else []
-    output_files = [f for f in os.listdir(output_path) if f.endswith('.txt')] if os.path.exists(output_path) else []
-    archive_files = [f for f in os.listdir(archive_path) if f.endswith('.txt')] if os.path.exists(archive_path) else []
+    output/ と archive/ は件数が多くなるため、検索インデックスの manifest.json があればそこから読む。
+    """
+    root_path = os.path.dirname(os.path.abspath(__file__))
+    input_info = list_folder(os.path.join(root_path, "input"))
+    manifest = load_manifest(os.path.join(root_path, "index"))
+    if manifest is not None:
+        folders = manifest.get("folders", {})
+        output_info, archive_info = [
+            (folders.get(kind, {}).get("count", 0), (folders.get(kind, {}).get("latest") or [None])[0])
+            for kind in ("minutes", "transcript")
+        ]
+    else:
+        output_info = list_folder(os.path.join(root_path, "output"))
+        archive_info = list_folder(os.path.join(root_path, "archive"))
     
-    return input_files, output_files, archive_files
+    return input_info, output_info, archive_info
 
 def draw_ui(status="停止中", message="", system_info=None, file_info=None, logs=None):
     """シンプルなUIを描画"""
@@ -135,10 +177,8 @@ def draw_ui(status="停止中", message="", system_info=None, file_info=None, lo
     print("-" * width)
     print("ファイル状況:")
     if file_info:
-        input_files, output_files, archive_files = file_info
-        print(f"  input/: {len(input_files)}件" + (f" (最新: {input_files[-1]})" if input_files else ""))
-        print(f"  output/: {len(output_files)}件" + (f" (最新: {output_files[-1]})" if output_files else ""))
-        print(f"  archive/: {len(archive_files)}件" + (f" (最新: {archive_files[-1]})" if archive_files else ""))
+        for folder, (count, latest) in zip(("input", "output", "archive"), file_info):
+            print(f"  {folder}/: {count}件" + (f" (最新: {latest})" if latest else ""))
     else:
         print("  情報が取得できませんでした")
     
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""長い文字起こしをトークン数の目安で分割する"""
+import logging
+
+try:
+    import tiktoken
+except ImportError:  # 未インストールの場合は estimate_tokens の概算を使う
+    tiktoken = None
+
+# モデル名 → tiktokenのエンコーディング（取得できなかったモデルはNone）
+_encodings = {}
+
+
+def estimate_tokens(text):
+    """トークン数の概算（日本語は1文字≒1トークン、英数字は4文字≒1トークン）"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def _encoding_for(model):
+    if model not in _encodings:
+        encoding = None
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:  # tiktokenが知らないモデル名
+                encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # 初回のエンコーディング取得（ダウンロード）に失敗した場合など
+            logging.warning(f"tiktokenを利用できないため概算でトークン数を数えます: {e}")
+        _encodings[model] = encoding
+    return _encodings[model]
+
+
+def count_tokens(text, model="gpt-4-turbo"):
+    """トークン数を数える（tiktokenがあれば正確に、無ければ estimate_tokens で概算）"""
+    encoding = _encoding_for(model) if tiktoken is not None else None
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_long_line(line, max_tokens):
+    """1行だけで上限を超える場合は文字数で分割（estimate_tokens と同じ数え方を1文字ずつ積み上げる）"""
+    pieces = []
+    start = 0
+    ascii_chars = other_chars = 0
+    for index, ch in enumerate(line):
+        is_ascii = ord(ch) < 128
+        tokens = other_chars + (not is_ascii) + (ascii_chars + is_ascii + 3) // 4
+        if index > start and tokens > max_tokens:
+            pieces.append(line[start:index])
+            start = index
+            ascii_chars = other_chars = 0
+        if is_ascii:
+            ascii_chars += 1
+        else:
+            other_chars += 1
+    if start < len(line):
+        pieces.append(line[start:])
+    return pieces
+
+
+def split_transcript(text, max_tokens, overlap_tokens=0):
+    """文字起こしを発言（行）・段落の境界で max_tokens 以下のチャンクに分割
+
+    overlap_tokens を指定すると、前のチャンク末尾の発言を次のチャンク先頭に含めて
+    チャンク境界で文脈が途切れないようにする。
+    """
+    units = []
+    for line in text.splitlines(keepends=True):
+        if estimate_tokens(line) > max_tokens:
+            units.extend(_split_long_line(line, max_tokens))
+        else:
+            units.append(line)
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append("".join(current))
+            # 重複部分として末尾の発言を引き継ぐ
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if carried_tokens + previous_tokens > overlap_tokens or carried_tokens + previous_tokens + unit_tokens > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_tokens
+            current = carried
+            current_tokens = carried_tokens
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""APIに送る前の文字起こしの整形（入力トークンの削減）
+
+録音・文字起こしツールの出力に含まれるタイムスタンプ、フィラー（えー・あの・まあ等）、
+同じ話者の細切れの発言、音声認識の繰り返しを取り除く。すべてローカルで処理する。
+
+使い方:
+  python transcript_cleaner.py 会議.txt  # 整形結果を表示
+  python transcript_cleaner.py --check   # 整形の確認用の例（CHECKS）を実行
+"""
+import re
+import sys
+import argparse
+from transcript_loader import load_transcript
+
+DEFAULT_FILLERS = ["えー", "えーと", "えっと", "あのー", "あの", "まあ", "まぁ", "うーん", "そのー", "なんか"]
+
+_OPEN = r"[\[\(（【]"
+_CLOSE = r"[\]\)）】]"
+_TIME = r"\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?"
+# 行頭のタイムスタンプ（SRT/VTT の "00:00:01,000 --> 00:00:03,000" 形式を含む）。
+# 括弧の無い時刻は後ろが空白・行末・【話者】の場合だけ（"10:00から再開します。" は発言として残す）
+LEADING_TIMESTAMP = re.compile(
+    rf"^\s*(?:{_OPEN}({_TIME}){_CLOSE}|({_TIME})(?=\s|$|【))(?:\s*-->\s*{_OPEN}?{_TIME}{_CLOSE}?)?\s*"
+)
+# 話者名と区切りの間の括弧付きタイムスタンプ（例: "山田 [00:01:23]："）。発言中の時刻は残す
+TAG_TIMESTAMP = re.compile(rf"^([^\s：:「」。、]{{1,20}}(?: [^\s：:「」。、]{{1,10}})?)\s*{_OPEN}{_TIME}{_CLOSE}\s*(?=[：:])")
+CUE_LINE = re.compile(rf"^\s*{_TIME}\s*-->\s*{_TIME}.*$")
+# 話者タグ（"山田：", "Speaker 1:", "【山田】"）。"14:03" のような時刻は話者とみなさない
+SPEAKER = re.compile(r"^(?:【([^】]{1,20})】|([^\s：:「」。、=/]{1,20}(?: [^\s：:「」。、=/]{1,10})?)\s*[：:](?!\d{2}))\s*(.*)$")
+# 読点などを挟んで同じ言葉が続く部分（"はい、はい、はい。" → "はい。"）
+_WORD = r"[^、。,，!?！？\s]"
+REPEATED_FRAGMENT = re.compile(rf"({_WORD}{{1,30}})(?:[、,，\s]+\1(?!{_WORD}))+")
+
+
+def _filler_pattern(fillers):
+    """前後が区切り（行頭・空白・句読点）のフィラーだけに一致する正規表現（"あの人" は残す）"""
+    words = "|".join(re.escape(word) for word in sorted(fillers, key=len, reverse=True))
+    return re.compile(rf"(?:(?<=^)|(?<=[\s、。「]))(?:{words})ー*(?:[、，,。…\s　]+|$)")
+
+
+def _strip_timestamp(line, mode, state):
+    """行頭・行中のタイムスタンプを削除して (残すタイムスタンプ, 残りの行) を返す
+
+    mode="compress" の場合は行頭のタイムスタンプの秒を落とし、直前と変わった時だけ残す。
+    """
+    match = LEADING_TIMESTAMP.match(line)
+    if match is None:
+        return None, TAG_TIMESTAMP.sub(r"\1", line)
+    rest = TAG_TIMESTAMP.sub(r"\1", line[match.end():].strip())
+    if mode != "compress":
+        return None, rest
+    parts = re.split(r"[.,]", match.group(1) or match.group(2))[0].split(":")
+    stamp = ":".join(parts[:2]) if len(parts) == 3 else ":".join(parts)
+    if stamp == state.get("last_stamp"):
+        return None, rest
+    state["last_stamp"] = stamp
+    return stamp, rest
+
+
+def clean_transcript(text, timestamps="strip", fillers=None, merge_speakers=True, dedupe=True):
+    """文字起こしを整形して返す
+
+    timestamps: "strip"（削除） / "compress"（分単位で変化した時だけ残す） / "keep"
+    fillers: 削除するフィラーのリスト（None で DEFAULT_FILLERS、空リストで削除しない）
+    merge_speakers: 同じ話者の連続した発言を1行にまとめる
+    dedupe: 音声認識で繰り返された言葉や直前と同じ発言を取り除く
+    """
+    filler_pattern = _filler_pattern(DEFAULT_FILLERS if fillers is None else fillers) if fillers != [] else None
+    state = {}
+    lines = []  # [タイムスタンプ, 話者, 発言] （無いものはNone）
+    recent = []  # 直近の発言（重複の判定用）
+    lines_text = text.splitlines()
+    for index, line in enumerate(lines_text):
+        stamp = None
+        if timestamps != "keep":
+            if CUE_LINE.match(line):
+                continue
+            # SRTの字幕番号（次の行がタイムコード）
+            if line.strip().isdigit() and index + 1 < len(lines_text) and CUE_LINE.match(lines_text[index + 1]):
+                continue
+            stamp, line = _strip_timestamp(line, timestamps, state)
+        line = line.strip()
+        if not line:
+            if lines and lines[-1] != [None, None, ""]:
+                lines.append([None, None, ""])
+            continue
+
+        match = SPEAKER.match(line)
+        speaker, body = (match.group(1) or match.group(2), match.group(3)) if match else (None, line)
+        if filler_pattern is not None:
+            body = filler_pattern.sub("", body).strip()
+        if dedupe:
+            body = REPEATED_FRAGMENT.sub(r"\1", body)
+            if (speaker, body) in recent:
+                continue
+            recent = (recent + [(speaker, body)])[-3:]
+        if not body and speaker is not None:
+            if stamp:
+                state.pop("last_stamp", None)  # タイムスタンプは次の発言に付ける
+            continue  # フィラーだけの発言
+
+        previous = lines[-1] if lines else None
+        if merge_speakers and speaker is not None and stamp is None and previous and previous[1] == speaker:
+            previous[2] = f"{previous[2]} {body}" if previous[2] else body
+        else:
+            lines.append([stamp, speaker, body])
+
+    output = []
+    for stamp, speaker, body in lines:
+        line = f"{speaker}：{body}" if speaker is not None else body
+        output.append(f"[{stamp}] {line}" if stamp else line)
+    return "\n".join(output).strip() + "\n"
+
+
+# 整形の確認用の例（python transcript_cleaner.py --check）: (入力, timestamps, 期待する出力)
+CHECKS = [
+    ("[00:01:23] 山田：はい。", "strip", "山田：はい。\n"),
+    ("00:01:23 山田：はい。", "compress", "[00:01] 山田：はい。\n"),
+    ("山田 [00:01:23]：おはようございます。", "strip", "山田：おはようございます。\n"),
+    ("1\n00:00:01,000 --> 00:00:03,000\nこんにちは", "strip", "こんにちは\n"),
+    # 発言中の時刻は残す
+    ("10:00から再開します。", "strip", "10:00から再開します。\n"),
+    ("鈴木：資料は（10:00）までに。", "strip", "鈴木：資料は（10:00）までに。\n"),
+    ("【山田】 10:00に集合", "strip", "山田：10:00に集合\n"),
+    ("山田：えー、その件は、あの人に聞きます。", "strip", "山田：その件は、あの人に聞きます。\n"),
+    ("山田：はい、はい、はい。\n山田：了解です。", "strip", "山田：はい。 了解です。\n"),
+]
+
+
+def check():
+    """CHECKS の例を整形し、期待と異なるものを表示して件数を返す"""
+    failures = 0
+    for text, timestamps, expected in CHECKS:
+        actual = clean_transcript(text, timestamps=timestamps)
+        if actual != expected:
+            failures += 1
+            print(f"NG: {text!r}\n    期待: {expected!r}\n    結果: {actual!r}")
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)}件 OK")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こしの整形結果を表示")
+    parser.add_argument("files", nargs="*", help="整形する文字起こしファイル")
+    parser.add_argument("--timestamps", choices=("strip", "compress", "keep"), default="strip")
+    parser.add_argument("--check", action="store_true", help="整形の確認用の例を実行する")
+    args = parser.parse_args()
+    if args.check:
+        return 1 if check() else 0
+    if not args.files:
+        parser.print_help()
+        return 0
+    for path in args.files:
+        text, _ = load_transcript(path)
+        sys.stdout.write(clean_transcript(text, timestamps=args.timestamps))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""文字起こし・ログファイルを1回の読み込みで文字コード判定してデコードする"""
+import os
+import mmap
+import codecs
+
+# 判定に使う先頭部分のサイズ
+SAMPLE_SIZE = 64 * 1024
+# これより大きいファイルはメモリマップで読み込む
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _is_valid_prefix(sample, encoding):
+    """sample が encoding として矛盾なくデコードできるか（末尾の途切れた文字は許容）"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _count_pairs(sample, lead, trail_low, trail_high):
+    """lead バイトの直後に trail_low〜trail_high のバイトが続く回数"""
+    count = 0
+    start = sample.find(lead)
+    while start != -1 and start + 1 < len(sample):
+        if trail_low <= sample[start + 1] <= trail_high:
+            count += 1
+        start = sample.find(lead, start + 1)
+    return count
+
+
+def detect_encodings(sample):
+    """先頭部分のバイト列から、試すべき文字コードを可能性の高い順に返す"""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return [encoding]
+    if sample.isascii() or _is_valid_prefix(sample, "utf-8"):
+        return ["utf-8", "shift_jis", "cp932", "euc_jp"]
+    sjis_valid = _is_valid_prefix(sample, "cp932")
+    euc_valid = _is_valid_prefix(sample, "euc_jp")
+    if sjis_valid and euc_valid:
+        # どちらとしても読める場合はひらがなのバイトパターンの出現数で判断
+        # Shift_JIS: 0x82 0x9F-0xF1 / EUC-JP: 0xA4 0xA1-0xF3
+        prefer_euc = _count_pairs(sample, b"\xa4", 0xA1, 0xF3) > _count_pairs(sample, b"\x82", 0x9F, 0xF1)
+    else:
+        prefer_euc = euc_valid
+    if prefer_euc:
+        return ["euc_jp", "shift_jis", "cp932", "utf-8"]
+    return ["shift_jis", "cp932", "euc_jp", "utf-8"]
+
+
+def decode_bytes(data):
+    """バイト列を判定した文字コードでデコードし (テキスト, 文字コード) を返す
+
+    どの文字コードでもデコードできない場合は UnicodeDecodeError を送出する。
+    """
+    sample = bytes(data[:SAMPLE_SIZE])
+    error = None
+    for encoding in detect_encodings(sample):
+        try:
+            return str(data, encoding), encoding
+        except UnicodeDecodeError as e:
+            error = e
+    raise error
+
+
+def load_transcript(path, mmap_threshold=MMAP_THRESHOLD):
+    """ファイルを1回だけ読み込んでデコードし (テキスト, 文字コード) を返す
+
+    大きなファイルはメモリマップ経由でデコードし、バイト列の複製を作らない。
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return "", "utf-8"
+        if size < mmap_threshold:
+            return decode_bytes(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decode_bytes(mapped)
+
+
+def read_tail_lines(path, count=5, block_size=4096):
+    """ファイル末尾から count 行を読み込む（ファイルサイズに関係なく末尾のブロックだけを読む）"""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.splitlines(keepends=True)
+    if position > 0:
+        lines = lines[1:]  # 途中から読んだ先頭行は不完全なので捨てる
+    text, _ = decode_bytes(b"".join(lines[-count:]))
+    return text.splitlines(keepends=True)